@@ -0,0 +1,87 @@
+import uuid
+import asyncio
+import logging
+import httpx
+
+logger = logging.getLogger(__name__)
+
+# Базовый URL API
+API_BASE_URL = "http://localhost:5000/api"
+
+API_TIMEOUT = 10
+API_CONNECT_TIMEOUT = 3
+API_MAX_CONNECTIONS = 50
+API_MAX_KEEPALIVE = 20
+API_MAX_CONCURRENCY = 100
+API_RETRIES = 3
+API_BACKOFF = 0.3
+
+# Ответы, после которых запрос имеет смысл повторить;
+# 409 - предыдущая попытка с тем же Idempotency-Key ещё выполняется
+RETRY_STATUSES = {409, 502, 503, 504}
+
+class ApiClient:
+    """Асинхронный клиент API сервера с общим пулом keep-alive соединений.
+    
+    Запросы повторяются при сетевых ошибках и 502/503/504 с экспоненциальной
+    задержкой. POST отправляется с заголовком Idempotency-Key, одинаковым
+    для всех попыток, поэтому сервер не выполнит изменение дважды. Повторяется
+    и 409: так сервер отвечает, пока предыдущая попытка с тем же ключом
+    (например, оборванная по таймауту) ещё выполняется, и следующая попытка
+    получит её сохранённый ответ.
+    """
+    
+    def __init__(self, base_url=API_BASE_URL, max_concurrency=API_MAX_CONCURRENCY):
+        self.base_url = base_url
+        self.client = None
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+    
+    def get_client(self):
+        if self.client is None or self.client.is_closed:
+            self.client = httpx.AsyncClient(
+                timeout=httpx.Timeout(API_TIMEOUT, connect=API_CONNECT_TIMEOUT),
+                limits=httpx.Limits(
+                    max_connections=API_MAX_CONNECTIONS,
+                    max_keepalive_connections=API_MAX_KEEPALIVE
+                )
+            )
+        return self.client
+    
+    async def request(self, endpoint, method='GET', data=None, timeout=None, retries=API_RETRIES):
+        """JSON ответа при статусе 200, иначе None"""
+        client = self.get_client()
+        url = f"{self.base_url}/{endpoint}"
+        kwargs = {}
+        if method == 'POST':
+            kwargs['json'] = data
+            kwargs['headers'] = {'Idempotency-Key': uuid.uuid4().hex}
+        if timeout is not None:
+            kwargs['timeout'] = timeout
+        
+        async with self.semaphore:
+            for attempt in range(retries + 1):
+                retry = False
+                try:
+                    logger.info(f"Making API request to: {url}")
+                    response = await client.request(method, url, **kwargs)
+                    logger.info(f"API response status: {response.status_code}")
+                    
+                    if response.status_code == 200:
+                        return response.json()
+                    logger.error(f"API Error: {response.status_code} - {response.text}")
+                    retry = response.status_code in RETRY_STATUSES
+                except httpx.HTTPError as e:
+                    logger.error(f"Request failed: {e}")
+                    retry = True
+                except ValueError as e:
+                    logger.error(f"JSON decode error: {e}")
+                    return None
+                
+                if not retry or attempt == retries:
+                    return None
+                await asyncio.sleep(API_BACKOFF * 2 ** attempt)
+    
+    async def close(self):
+        if self.client is not None:
+            await self.client.aclose()
+            self.client = None
@@ -0,0 +1,236 @@
+import os
+import json
+import uuid
+import time
+import asyncio
+import logging
+from collections import OrderedDict
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup
+from telegram.error import RetryAfter, Forbidden, BadRequest, TelegramError
+
+logger = logging.getLogger(__name__)
+
+# Лимиты Telegram: около 30 сообщений в секунду на бота и не чаще
+# одного сообщения в секунду в один чат. Берём с запасом
+BROADCAST_RATE = 25
+BROADCAST_BURST = 25
+BROADCAST_CHAT_INTERVAL = 1.0
+BROADCAST_CHATS = 10000
+
+# Получателей за один шаг задачи (один запрос к API); прогресс сохраняется после каждого шага
+BROADCAST_CHUNK = 200
+BROADCAST_CONCURRENCY = 10
+BROADCAST_SEND_ATTEMPTS = 3
+
+BROADCAST_JOB = 'broadcast'
+
+# Откуда берутся получатели: все пользователи или те, кому доступен ежедневный бонус
+BROADCAST_SOURCES = {
+    'announce': 'admin/user-ids',
+    'bonus': 'admin/bonus-claimable',
+}
+
+BONUS_REMINDER_TEXT = "🎁 Ежедневный бонус снова доступен! Заберите звёзды в Ghost FluX Casino."
+
+class TokenBucket:
+    """Общий для всех рассылок лимит отправки сообщений ботом.
+    
+    Работает в одном цикле событий, поэтому без блокировок. pause()
+    останавливает все отправки после 429 от Telegram.
+    """
+    
+    def __init__(self, rate=BROADCAST_RATE, capacity=BROADCAST_BURST, chat_interval=BROADCAST_CHAT_INTERVAL):
+        self.rate = rate
+        self.capacity = capacity
+        self.chat_interval = chat_interval
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+        self.paused_until = 0.0
+        self.chats = OrderedDict()
+    
+    def pause(self, seconds):
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+    
+    async def acquire(self, chat_id):
+        while True:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+            self.updated_at = now
+            
+            wait = max(
+                self.paused_until - now,
+                self.chats.get(chat_id, 0.0) - now,
+                (1 - self.tokens) / self.rate
+            )
+            if wait <= 0:
+                self.tokens -= 1
+                self.chats[chat_id] = now + self.chat_interval
+                self.chats.move_to_end(chat_id)
+                if len(self.chats) > BROADCAST_CHATS:
+                    self.chats.popitem(last=False)
+                return
+            await asyncio.sleep(wait)
+
+class Broadcaster:
+    """Рассылки по пользователям бота через JobQueue.
+    
+    Одна рассылка за раз. Каждый шаг задачи берёт из API следующую порцию
+    получателей по курсору, отправляет сообщения через TokenBucket и
+    сохраняет курсор и счётчики в файл, после чего ставит следующий шаг.
+    После перезапуска бота рассылка продолжается с сохранённого курсора
+    (сообщения последнего незавершённого шага могут уйти повторно).
+    """
+    
+    def __init__(self, api_client, state_path, webapp_url=None):
+        self.api_client = api_client
+        self.state_path = state_path
+        self.webapp_url = webapp_url
+        self.bucket = TokenBucket()
+        self.state = self.load_state()
+    
+    def load_state(self):
+        try:
+            with open(self.state_path, encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.error(f"Could not load broadcast state: {e}")
+            return None
+    
+    def save_state(self):
+        # Запись через временный файл: при падении остаётся прежнее состояние, а не обрезанное
+        tmp_path = f"{self.state_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.state, f, ensure_ascii=False)
+        os.replace(tmp_path, self.state_path)
+    
+    @property
+    def running(self):
+        return bool(self.state and self.state['status'] == 'running')
+    
+    def start(self, job_queue, kind, text):
+        """Запускает рассылку; False, если другая ещё идёт"""
+        if self.running:
+            return False
+        self.state = {
+            'id': uuid.uuid4().hex,
+            'kind': kind,
+            'text': text,
+            'status': 'running',
+            'cursor': None,
+            'sent': 0,
+            'blocked': 0,
+            'failed': 0,
+            'started_at': int(time.time()),
+            'finished_at': None
+        }
+        self.save_state()
+        self.schedule(job_queue)
+        logger.info(f"Broadcast started: {kind}")
+        return True
+    
+    def resume(self, job_queue):
+        if self.running and not job_queue.get_jobs_by_name(BROADCAST_JOB):
+            logger.info(f"Resuming broadcast {self.state['kind']} from cursor {self.state['cursor']}")
+            self.schedule(job_queue)
+    
+    def cancel(self):
+        if not self.running:
+            return False
+        self.finish('cancelled')
+        return True
+    
+    def schedule(self, job_queue, delay=0):
+        # id в задаче: шаг остановленной рассылки не продолжит следующую
+        job_queue.run_once(self.run_chunk, delay, data=self.state['id'], name=BROADCAST_JOB)
+    
+    def finish(self, status):
+        self.state['status'] = status
+        self.state['finished_at'] = int(time.time())
+        self.save_state()
+        logger.info(
+            f"Broadcast {status}: sent {self.state['sent']}, "
+            f"blocked {self.state['blocked']}, failed {self.state['failed']}"
+        )
+    
+    def status_text(self):
+        if not self.state:
+            return "📭 Рассылок ещё не было"
+        statuses = {'running': 'идёт', 'done': 'завершена', 'cancelled': 'остановлена'}
+        kinds = {'announce': 'объявление', 'bonus': 'напоминание о бонусе'}
+        return (
+            f"📣 Рассылка ({kinds.get(self.state['kind'], self.state['kind'])}): "
+            f"{statuses.get(self.state['status'], self.state['status'])}\n"
+            f"✅ Доставлено: {self.state['sent']}\n"
+            f"🚫 Бот заблокирован: {self.state['blocked']}\n"
+            f"❌ Ошибок: {self.state['failed']}"
+        )
+    
+    def reply_markup(self):
+        if self.state['kind'] == 'bonus' and self.webapp_url:
+            return InlineKeyboardMarkup([
+                [InlineKeyboardButton("🎁 Забрать бонус", web_app={'url': self.webapp_url})]
+            ])
+        return None
+    
+    async def run_chunk(self, context):
+        """Шаг задачи JobQueue: одна порция получателей"""
+        state = self.state
+        if not self.running or context.job.data != state['id']:
+            return
+        
+        endpoint = f"{BROADCAST_SOURCES[state['kind']]}?limit={BROADCAST_CHUNK}"
+        if state['cursor']:
+            endpoint += f"&cursor={state['cursor']}"
+        page = await self.api_client.request(endpoint)
+        if page is None:
+            # API недоступен - повторяем шаг позже с того же курсора
+            logger.warning("Broadcast: could not fetch recipients, retrying in 30s")
+            self.schedule(context.job_queue, 30)
+            return
+        
+        semaphore = asyncio.Semaphore(BROADCAST_CONCURRENCY)
+        reply_markup = self.reply_markup()
+        
+        async def deliver(chat_id):
+            async with semaphore:
+                return await self.send(context.bot, chat_id, state['text'], reply_markup)
+        
+        results = await asyncio.gather(*(deliver(chat_id) for chat_id in page['user_ids']))
+        
+        # Рассылку могли остановить, пока шла порция
+        if not self.running or self.state is not state:
+            return
+        for result in results:
+            state[result] += 1
+        state['cursor'] = page['next_cursor']
+        
+        if page['next_cursor'] is None:
+            self.finish('done')
+        else:
+            self.save_state()
+            self.schedule(context.job_queue)
+    
+    async def send(self, bot, chat_id, text, reply_markup=None):
+        """'sent', 'blocked' или 'failed'. 429 не считается неудачной попыткой"""
+        attempts = 0
+        while True:
+            await self.bucket.acquire(chat_id)
+            try:
+                await bot.send_message(chat_id=chat_id, text=text, reply_markup=reply_markup)
+                return 'sent'
+            except RetryAfter as e:
+                # 429 - лимит превышен для всего бота: останавливаем все отправки
+                logger.warning(f"Broadcast flood control, retry after {e.retry_after}s")
+                self.bucket.pause(e.retry_after)
+            except Forbidden:
+                return 'blocked'
+            except BadRequest as e:
+                logger.warning(f"Broadcast to {chat_id} rejected: {e}")
+                return 'failed'
+            except TelegramError as e:
+                attempts += 1
+                logger.warning(f"Broadcast to {chat_id} failed (attempt {attempts}): {e}")
+                if attempts >= BROADCAST_SEND_ATTEMPTS:
+                    return 'failed'
@@ -1,7 +1,16 @@
-BOT_TOKEN = "7877247730:AAEz52OmuzAX940LEjnS6mNrGBmXIEZ5hSw"
-ADMIN_ID = 5450857649
-ADMIN_USERNAME = "@KXKXKXKXKXKXKXKXKXKXK"
-CHANNEL_USERNAME = "Ghost_FluX"
-
-# Ваш реальный URL GitHub Pages
-WEBAPP_URL = "https://fla1ner.github.io/ghost-flux-casino-number1/"
\ No newline at end of file
+BOT_TOKEN = "7877247730:AAEz52OmuzAX940LEjnS6mNrGBmXIEZ5hSw"
+ADMIN_ID = 5450857649
+ADMIN_USERNAME = "@KXKXKXKXKXKXKXKXKXKXK"
+CHANNEL_USERNAME = "Ghost_FluX"
+
+# Ваш реальный URL GitHub Pages
+WEBAPP_URL = "https://fla1ner.github.io/ghost-flux-casino-number1/"
+
+# Режим работы с API: "http" - через Flask сервер, "embedded" - напрямую с БД в процессе бота
+API_MODE = "http"
+# Путь к БД для режима "embedded" (None - ghost_flux.db в папке server)
+EMBEDDED_DB_PATH = None
+# Файл с прогрессом рассылки: после перезапуска бот продолжает её с места остановки
+BROADCAST_STATE_PATH = "broadcast_state.json"
+# Время ежедневного напоминания о бонусе (UTC, "ЧЧ:ММ"); None - не напоминать
+BONUS_REMINDER_TIME = "12:00"
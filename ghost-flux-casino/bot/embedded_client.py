@@ -0,0 +1,57 @@
+import os
+import sys
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+SERVER_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'server')
+
+EMBEDDED_WORKERS = 8
+
+class EmbeddedClient:
+    """Клиент с интерфейсом ApiClient, который вызывает CasinoService в этом же процессе.
+    
+    Для установки на одной машине: бот работает с файлом SQLite напрямую,
+    без HTTP и сериализации JSON. Запросы к БД выполняются в пуле потоков,
+    чтобы не блокировать цикл событий бота.
+    """
+    
+    def __init__(self, db_path=None, max_workers=EMBEDDED_WORKERS):
+        self.db_path = db_path
+        self.max_workers = max_workers
+        self.service = None
+    
+    def get_service(self):
+        if self.service is None:
+            if SERVER_DIR not in sys.path:
+                sys.path.insert(0, SERVER_DIR)
+            from database import Database, DB_PATH
+            from services import CasinoService, AsyncCasinoService
+            
+            db = Database(self.db_path or os.path.join(SERVER_DIR, DB_PATH))
+            self.service = AsyncCasinoService(CasinoService(db), self.max_workers)
+        return self.service
+    
+    async def request(self, endpoint, method='GET', data=None, timeout=None):
+        """Тело ответа при статусе 200, иначе None"""
+        try:
+            service = self.get_service()
+            body, status = await asyncio.wait_for(service.dispatch(endpoint, method, data), timeout)
+        except asyncio.TimeoutError:
+            logger.error(f"Embedded request timed out: {method} {endpoint}")
+            return None
+        except Exception as e:
+            logger.error(f"Embedded request failed: {e}")
+            return None
+        
+        if status == 200:
+            return body
+        logger.error(f"API Error: {status} - {body}")
+        return None
+    
+    async def close(self):
+        if self.service is not None:
+            self.service.close()
+            self.service.service.db.close()
+            self.service = None
@@ -1,371 +1,612 @@
-import logging
-from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
-from telegram.ext import Application, CommandHandler, CallbackQueryHandler, ContextTypes
-import requests
-import json
-from config import BOT_TOKEN, ADMIN_ID, ADMIN_USERNAME, CHANNEL_USERNAME, WEBAPP_URL
-
-# Настройка логирования
-logging.basicConfig(
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    level=logging.INFO
-)
-logger = logging.getLogger(__name__)
-
-# Базовый URL API
-API_BASE_URL = "http://localhost:5000/api"
-
-def make_api_request(endpoint, method='GET', data=None):
-    """Универсальная функция для API запросов с обработкой ошибок"""
-    try:
-        url = f"{API_BASE_URL}/{endpoint}"
-        logger.info(f"Making API request to: {url}")
-        
-        if method == 'GET':
-            response = requests.get(url, timeout=10)
-        elif method == 'POST':
-            response = requests.post(url, json=data, timeout=10)
-        
-        logger.info(f"API response status: {response.status_code}")
-        
-        if response.status_code == 200:
-            return response.json()
-        else:
-            logger.error(f"API Error: {response.status_code} - {response.text}")
-            return None
-    except requests.exceptions.RequestException as e:
-        logger.error(f"Request failed: {e}")
-        return None
-    except json.JSONDecodeError as e:
-        logger.error(f"JSON decode error: {e}")
-        return None
-
-def escape_markdown(text):
-    """Экранирование специальных символов для MarkdownV2"""
-    if not text:
-        return ""
-    escape_chars = r'_*[]()~`>#+-=|{}.!'
-    return ''.join(['\\' + char if char in escape_chars else char for char in str(text)])
-
-async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    try:
-        user = update.effective_user
-        user_id = user.id
-        username = user.username or "Unknown"
-        
-        logger.info(f"Start command from user {user_id} (@{username})")
-        
-        # Регистрируем пользователя (но не блокируем если сервер недоступен)
-        try:
-            result = make_api_request('register', 'POST', {
-                'user_id': user_id,
-                'username': username
-            })
-            
-            if result is None:
-                logger.warning(f"Failed to register user {user_id}, but continuing...")
-            else:
-                logger.info(f"User {user_id} registered successfully")
-        except Exception as e:
-            logger.warning(f"Registration failed but continuing: {e}")
-        
-        # Создаем клавиатуру
-        keyboard = [
-            [InlineKeyboardButton("🎮 Открыть Ghost FluX Casino", web_app={'url': WEBAPP_URL})],
-            [InlineKeyboardButton("📢 Наш канал", url=f"https://t.me/{CHANNEL_USERNAME}")],
-            [InlineKeyboardButton("💬 Купить звёзды", url=ADMIN_USERNAME)]
-        ]
-        
-        reply_markup = InlineKeyboardMarkup(keyboard)
-        
-        # Текст без Markdown для надежности
-        welcome_text = f"""👻 Добро пожаловать в Ghost FluX Casino!
-
-🎰 Игровые режимы:
-• 🎡 Рулетка (25 звёзд)
-• 🎁 Ежедневный бонус
-
-💫 Пополнение баланса:
-50 звёзд = 85 руб
-100 звёзд = 160 руб
-250 звёзд = 400 руб
-
-💌 Связь: {ADMIN_USERNAME}
-
-Нажмите кнопку ниже чтобы открыть казино! 🎮"""
-        
-        await update.message.reply_text(
-            welcome_text,
-            reply_markup=reply_markup
-            # Убрал parse_mode для избежания ошибок
-        )
-        
-        logger.info(f"Start message sent to user {user_id}")
-        
-    except Exception as e:
-        logger.error(f"Error in start command: {e}")
-        await update.message.reply_text(
-            "❌ Произошла ошибка при запуске. Пожалуйста, попробуйте позже."
-        )
-
-async def admin_panel(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    try:
-        user_id = update.effective_user.id
-        if user_id != ADMIN_ID:
-            await update.message.reply_text("❌ Доступ запрещен")
-            return
-        
-        keyboard = [
-            [InlineKeyboardButton("📊 Статистика", callback_data="admin_stats")],
-            [InlineKeyboardButton("📤 Заявки на вывод", callback_data="admin_withdrawals")],
-            [InlineKeyboardButton("⭐ Добавить звёзды", callback_data="admin_add_stars")],
-            [InlineKeyboardButton("🔄 Обновить", callback_data="admin_refresh")]
-        ]
-        
-        reply_markup = InlineKeyboardMarkup(keyboard)
-        await update.message.reply_text("👑 Панель администратора", reply_markup=reply_markup)
-        
-    except Exception as e:
-        logger.error(f"Error in admin_panel: {e}")
-        await update.message.reply_text("❌ Ошибка при открытии админ панели")
-
-async def handle_admin_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    try:
-        query = update.callback_query
-        user_id = query.from_user.id
-        
-        if user_id != ADMIN_ID:
-            await query.answer("❌ Доступ запрещен")
-            return
-        
-        await query.answer()
-        data = query.data
-        
-        if data == "admin_withdrawals":
-            withdrawals = make_api_request('admin/withdrawals')
-            
-            if not withdrawals:
-                text = "📭 Нет pending заявок на вывод"
-            else:
-                text = "📤 Заявки на вывод:\n\n"
-                for w in withdrawals:
-                    text += f"ID: {w['id']}\n"
-                    text += f"Пользователь: @{w['username']} (ID: {w['user_id']})\n"
-                    text += f"Предмет: {w['item_name']} ({w['item_value']} звёзд)\n"
-                    text += f"Время: {w['created_at'][:19]}\n"
-                    text += "⎯⎯⎯⎯⎯⎯⎯⎯⎯⎯⎯⎯⎯\n"
-            
-            keyboard = [
-                [InlineKeyboardButton("🔄 Обновить", callback_data="admin_withdrawals")],
-                [InlineKeyboardButton("📋 Главное меню", callback_data="admin_back")]
-            ]
-            reply_markup = InlineKeyboardMarkup(keyboard)
-            
-            await query.edit_message_text(text, reply_markup=reply_markup)
-        
-        elif data == "admin_stats":
-            stats = make_api_request('admin/stats')
-            
-            if stats:
-                users_count = stats.get('total_users', 'N/A')
-                total_withdrawals = stats.get('total_withdrawals', 'N/A')
-            else:
-                users_count = "N/A"
-                total_withdrawals = "N/A"
-            
-            text = (
-                f"📊 Статистика Ghost FluX\n\n"
-                f"👥 Пользователи: {users_count}\n"
-                f"📤 Всего выводов: {total_withdrawals}\n"
-                f"👑 Админ: {ADMIN_USERNAME}"
-            )
-            
-            keyboard = [
-                [InlineKeyboardButton("🔄 Обновить", callback_data="admin_stats")],
-                [InlineKeyboardButton("📋 Главное меню", callback_data="admin_back")]
-            ]
-            reply_markup = InlineKeyboardMarkup(keyboard)
-            
-            await query.edit_message_text(text, reply_markup=reply_markup)
-        
-        elif data == "admin_add_stars":
-            text = (
-                "⭐ Добавление звёзд\n\n"
-                "Используйте команду:\n"
-                "/addstars user_id amount\n\n"
-                "Пример:\n"
-                "/addstars 123456789 100"
-            )
-            
-            keyboard = [
-                [InlineKeyboardButton("📋 Главное меню", callback_data="admin_back")]
-            ]
-            reply_markup = InlineKeyboardMarkup(keyboard)
-            
-            await query.edit_message_text(text, reply_markup=reply_markup)
-        
-        elif data == "admin_back" or data == "admin_refresh":
-            await admin_panel(update, context)
-            
-    except Exception as e:
-        logger.error(f"Error in handle_admin_callback: {e}")
-        await query.edit_message_text("❌ Ошибка при обработке запроса")
-
-async def add_stars_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    try:
-        user_id = update.effective_user.id
-        if user_id != ADMIN_ID:
-            await update.message.reply_text("❌ Доступ запрещен")
-            return
-        
-        if len(context.args) != 2:
-            await update.message.reply_text(
-                "❌ Неправильный формат команды\n\n"
-                "Используйте: /addstars user_id amount\n"
-                "Пример: /addstars 123456789 100"
-            )
-            return
-        
-        target_user_id = int(context.args[0])
-        amount = int(context.args[1])
-        
-        result = make_api_request('admin/add-stars', 'POST', {
-            'user_id': target_user_id,
-            'amount': amount
-        })
-        
-        if result:
-            await update.message.reply_text(
-                f"✅ Успешно добавлено {amount}⭐ пользователю {target_user_id}"
-            )
-            
-            # Пытаемся отправить уведомление пользователю
-            try:
-                await context.bot.send_message(
-                    chat_id=target_user_id,
-                    text=f"🎉 Вам начислено {amount}⭐ на баланс!\n\n💫 Новый баланс можно проверить в Mini App"
-                )
-            except Exception as e:
-                logger.warning(f"Could not notify user {target_user_id}: {e}")
-                
-        else:
-            await update.message.reply_text("❌ Ошибка при добавлении звёзд")
-            
-    except ValueError:
-        await update.message.reply_text("❌ Неверный формат ID или количества звёзд")
-    except Exception as e:
-        logger.error(f"Error in add_stars_command: {e}")
-        await update.message.reply_text("❌ Ошибка при выполнении команды")
-
-async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Команда помощи"""
-    help_text = """
-🤖 Команды бота Ghost FluX:
-
-/start - Начать работу
-/help - Показать эту справку
-/stats - Моя статистика
-
-👑 Команды администратора:
-/admin - Панель управления
-/addstars user_id amount - Добавить звёзды
-/complete withdrawal_id - Завершить вывод
-
-💫 Пополнение баланса:
-50⭐ = 85 руб | 100⭐ = 160 руб | 250⭐ = 400 руб
-Связь: @KXKXKXKXKXKXKXKXKXKXK
-    """
-    await update.message.reply_text(help_text)
-
-async def user_stats_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Команда для просмотра статистики пользователя"""
-    try:
-        user_id = update.effective_user.id
-        
-        # Определяем ID пользователя для статистики
-        if len(context.args) == 1 and update.effective_user.id == ADMIN_ID:
-            try:
-                target_user_id = int(context.args[0])
-            except ValueError:
-                target_user_id = user_id
-        else:
-            target_user_id = user_id
-        
-        stats = make_api_request(f'user/stats/{target_user_id}')
-        user_data = make_api_request(f'user/{target_user_id}')
-        
-        if stats and user_data:
-            username = user_data.get('username', 'Unknown')
-            balance = user_data.get('balance', 0)
-            
-            text = (
-                f"📊 Статистика пользователя @{username}\n\n"
-                f"🆔 ID: {target_user_id}\n"
-                f"⭐ Баланс: {balance}\n"
-                f"🎡 Спинов: {stats.get('spins_count', 0)}\n"
-                f"🏆 Всего выиграно: {stats.get('total_won', 0)}⭐\n"
-            )
-            
-            if stats.get('last_spin'):
-                text += f"⏰ Последний спин: {stats['last_spin'][:19]}"
-            
-            await update.message.reply_text(text)
-        else:
-            await update.message.reply_text("❌ Ошибка при получении статистики")
-            
-    except Exception as e:
-        logger.error(f"Error in user_stats_command: {e}")
-        await update.message.reply_text("❌ Ошибка при получении статистики")
-
-async def error_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Обработчик ошибок"""
-    try:
-        logger.error(f"Exception while handling an update: {context.error}", exc_info=context.error)
-        
-        # Более информативное сообщение об ошибке
-        error_message = f"""
-❌ Произошла техническая ошибка.
-
-Возможные причины:
-• Сервер временно недоступен
-• Проблемы с подключением
-• Технические работы
-
-Пожалуйста, попробуйте позже или свяжитесь с администратором: {ADMIN_USERNAME}
-        """
-        
-        if update and update.effective_message:
-            await update.effective_message.reply_text(error_message)
-    except Exception as e:
-        logger.error(f"Error in error handler: {e}")
-
-def main():
-    try:
-        logger.info("Starting Ghost FluX Casino Bot...")
-        logger.info(f"Admin ID: {ADMIN_ID}")
-        logger.info(f"WebApp URL: {WEBAPP_URL}")
-        
-        # Создаем приложение
-        application = Application.builder().token(BOT_TOKEN).build()
-        
-        # Обработчики команд
-        application.add_handler(CommandHandler("start", start))
-        application.add_handler(CommandHandler("help", help_command))
-        application.add_handler(CommandHandler("admin", admin_panel))
-        application.add_handler(CommandHandler("addstars", add_stars_command))
-        application.add_handler(CommandHandler("stats", user_stats_command))
-        
-        # Обработчики callback запросов
-        application.add_handler(CallbackQueryHandler(handle_admin_callback, pattern="^admin_"))
-        
-        # Обработчик ошибок
-        application.add_error_handler(error_handler)
-        
-        logger.info("Bot started successfully!")
-        application.run_polling()
-        
-    except Exception as e:
-        logger.error(f"Failed to start bot: {e}")
-
-if __name__ == '__main__':
+import logging
+from datetime import time as dt_time, timezone
+from urllib.parse import urlencode
+from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
+from telegram.ext import Application, CommandHandler, CallbackQueryHandler, ContextTypes
+from api_client import ApiClient
+from embedded_client import EmbeddedClient
+from broadcast import Broadcaster, BONUS_REMINDER_TEXT
+from config import (
+    BOT_TOKEN, ADMIN_ID, ADMIN_USERNAME, CHANNEL_USERNAME, WEBAPP_URL, API_MODE, EMBEDDED_DB_PATH,
+    BROADCAST_STATE_PATH, BONUS_REMINDER_TIME
+)
+
+# Настройка логирования
+logging.basicConfig(
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    level=logging.INFO
+)
+logger = logging.getLogger(__name__)
+
+# Общий клиент API: пул соединений создаётся при первом запросе и закрывается при остановке бота.
+# В режиме embedded те же запросы выполняются сервисным слоем сервера внутри процесса бота
+if API_MODE == "embedded":
+    api_client = EmbeddedClient(EMBEDDED_DB_PATH)
+else:
+    api_client = ApiClient()
+
+# Рассылки идут задачами JobQueue и не занимают обработчики команд
+broadcaster = Broadcaster(api_client, BROADCAST_STATE_PATH, WEBAPP_URL)
+
+async def make_api_request(endpoint, method='GET', data=None, timeout=None):
+    """Универсальная функция для API запросов с обработкой ошибок"""
+    return await api_client.request(endpoint, method, data, timeout=timeout)
+
+# Очередь выводов в админ-панели: заявок на странице и порядок переключения фильтра статуса
+WITHDRAWALS_PAGE_SIZE = 10
+WITHDRAWAL_FILTERS = ('pending', 'approved', 'completed', 'all')
+WITHDRAWAL_FILTER_NAMES = {
+    'pending': 'ожидают',
+    'approved': 'одобрены',
+    'completed': 'выполнены',
+    'all': 'все'
+}
+# Ограничение Telegram на длину текста сообщения
+MAX_MESSAGE_LENGTH = 4096
+
+def escape_markdown(text):
+    """Экранирование специальных символов для MarkdownV2"""
+    if not text:
+        return ""
+    escape_chars = r'_*[]()~`>#+-=|{}.!'
+    return ''.join(['\\' + char if char in escape_chars else char for char in str(text)])
+
+async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    try:
+        user = update.effective_user
+        user_id = user.id
+        username = user.username or "Unknown"
+        
+        logger.info(f"Start command from user {user_id} (@{username})")
+        
+        # Регистрируем пользователя (но не блокируем если сервер недоступен).
+        # Регистрация идемпотентна, поэтому повторный /start её не повторяет
+        registered_users = context.bot_data.setdefault('registered_users', set())
+        if user_id not in registered_users:
+            try:
+                result = await make_api_request('register', 'POST', {
+                    'user_id': user_id,
+                    'username': username
+                })
+                
+                if result is None:
+                    logger.warning(f"Failed to register user {user_id}, but continuing...")
+                else:
+                    registered_users.add(user_id)
+                    logger.info(f"User {user_id} registered successfully")
+            except Exception as e:
+                logger.warning(f"Registration failed but continuing: {e}")
+        
+        # Создаем клавиатуру
+        keyboard = [
+            [InlineKeyboardButton("🎮 Открыть Ghost FluX Casino", web_app={'url': WEBAPP_URL})],
+            [InlineKeyboardButton("📢 Наш канал", url=f"https://t.me/{CHANNEL_USERNAME}")],
+            [InlineKeyboardButton("💬 Купить звёзды", url=ADMIN_USERNAME)]
+        ]
+        
+        reply_markup = InlineKeyboardMarkup(keyboard)
+        
+        # Текст без Markdown для надежности
+        welcome_text = f"""👻 Добро пожаловать в Ghost FluX Casino!
+
+🎰 Игровые режимы:
+• 🎡 Рулетка (25 звёзд)
+• 🎁 Ежедневный бонус
+
+💫 Пополнение баланса:
+50 звёзд = 85 руб
+100 звёзд = 160 руб
+250 звёзд = 400 руб
+
+💌 Связь: {ADMIN_USERNAME}
+
+Нажмите кнопку ниже чтобы открыть казино! 🎮"""
+        
+        await update.message.reply_text(
+            welcome_text,
+            reply_markup=reply_markup
+            # Убрал parse_mode для избежания ошибок
+        )
+        
+        logger.info(f"Start message sent to user {user_id}")
+        
+    except Exception as e:
+        logger.error(f"Error in start command: {e}")
+        await update.message.reply_text(
+            "❌ Произошла ошибка при запуске. Пожалуйста, попробуйте позже."
+        )
+
+def get_withdrawals_state(context):
+    """Фильтры и стек курсоров очереди выводов в данных пользователя (админа)"""
+    return context.user_data.setdefault('withdrawals', {
+        'status': 'pending',
+        'user_id': None,
+        'cursors': [None],
+        'next_cursor': None,
+        'page_ids': []
+    })
+
+async def render_withdrawals(context):
+    """Текст и клавиатура текущей страницы очереди выводов"""
+    state = get_withdrawals_state(context)
+    params = {'status': state['status'], 'limit': WITHDRAWALS_PAGE_SIZE}
+    if state['user_id']:
+        params['user_id'] = state['user_id']
+    if state['cursors'][-1]:
+        params['cursor'] = state['cursors'][-1]
+    
+    page = await make_api_request(f"admin/withdrawals?{urlencode(params)}")
+    withdrawals = page['withdrawals'] if page else []
+    state['next_cursor'] = page['next_cursor'] if page else None
+    state['page_ids'] = [w['id'] for w in withdrawals]
+    
+    title = f"📤 Заявки на вывод ({WITHDRAWAL_FILTER_NAMES[state['status']]})"
+    if state['user_id']:
+        title += f", пользователь {state['user_id']}"
+    title += f", стр. {len(state['cursors'])}"
+    
+    if page is None:
+        lines = [title, "", "❌ Ошибка при получении заявок"]
+    elif not withdrawals:
+        lines = [title, "", "📭 Заявок нет"]
+    else:
+        lines = [title, ""]
+        for w in withdrawals:
+            lines.append(
+                f"#{w['id']} [{w['status']}] @{w['username']} (ID: {w['user_id']})\n"
+                f"{w['item_name']} ({w['item_value']} звёзд), {(w['created_at'] or '')[:19]}"
+            )
+    text = "\n".join(lines)[:MAX_MESSAGE_LENGTH]
+    
+    navigation = []
+    if len(state['cursors']) > 1:
+        navigation.append(InlineKeyboardButton("⬅️ Назад", callback_data="admin_wd_prev"))
+    if state['next_cursor']:
+        navigation.append(InlineKeyboardButton("Далее ➡️", callback_data="admin_wd_next"))
+    
+    keyboard = []
+    if navigation:
+        keyboard.append(navigation)
+    if state['page_ids'] and state['status'] in ('pending', 'approved', 'all'):
+        actions = [InlineKeyboardButton("✅ Завершить страницу", callback_data="admin_wd_complete")]
+        if state['status'] in ('pending', 'all'):
+            actions.insert(0, InlineKeyboardButton("👍 Одобрить страницу", callback_data="admin_wd_approve"))
+        keyboard.append(actions)
+    
+    filters = [InlineKeyboardButton("🔀 Статус", callback_data="admin_wd_status")]
+    if state['user_id']:
+        filters.append(InlineKeyboardButton("👤 Все пользователи", callback_data="admin_wd_user_reset"))
+    keyboard.append(filters)
+    keyboard.append([
+        InlineKeyboardButton("🔄 Обновить", callback_data="admin_withdrawals"),
+        InlineKeyboardButton("📋 Главное меню", callback_data="admin_back")
+    ])
+    
+    return text, InlineKeyboardMarkup(keyboard)
+
+async def admin_panel(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    try:
+        user_id = update.effective_user.id
+        if user_id != ADMIN_ID:
+            await update.message.reply_text("❌ Доступ запрещен")
+            return
+        
+        keyboard = [
+            [InlineKeyboardButton("📊 Статистика", callback_data="admin_stats")],
+            [InlineKeyboardButton("📤 Заявки на вывод", callback_data="admin_withdrawals")],
+            [InlineKeyboardButton("⭐ Добавить звёзды", callback_data="admin_add_stars")],
+            [InlineKeyboardButton("📣 Рассылка", callback_data="admin_broadcast")],
+            [InlineKeyboardButton("🔄 Обновить", callback_data="admin_refresh")]
+        ]
+        
+        reply_markup = InlineKeyboardMarkup(keyboard)
+        await update.message.reply_text("👑 Панель администратора", reply_markup=reply_markup)
+        
+    except Exception as e:
+        logger.error(f"Error in admin_panel: {e}")
+        await update.message.reply_text("❌ Ошибка при открытии админ панели")
+
+async def handle_admin_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    try:
+        query = update.callback_query
+        user_id = query.from_user.id
+        
+        if user_id != ADMIN_ID:
+            await query.answer("❌ Доступ запрещен")
+            return
+        
+        await query.answer()
+        data = query.data
+        
+        if data == "admin_withdrawals":
+            # Открываем очередь с первой страницы, фильтры сохраняются
+            get_withdrawals_state(context)['cursors'] = [None]
+            text, reply_markup = await render_withdrawals(context)
+            await query.edit_message_text(text, reply_markup=reply_markup)
+        
+        elif data.startswith("admin_wd_"):
+            state = get_withdrawals_state(context)
+            action = data[len("admin_wd_"):]
+            notice = None
+            
+            if action == "next" and state.get('next_cursor'):
+                state['cursors'].append(state['next_cursor'])
+            elif action == "prev" and len(state['cursors']) > 1:
+                state['cursors'].pop()
+            elif action == "status":
+                index = WITHDRAWAL_FILTERS.index(state['status'])
+                state['status'] = WITHDRAWAL_FILTERS[(index + 1) % len(WITHDRAWAL_FILTERS)]
+                state['cursors'] = [None]
+            elif action == "user_reset":
+                state['user_id'] = None
+                state['cursors'] = [None]
+            elif action in ("approve", "complete") and state.get('page_ids'):
+                result = await make_api_request('admin/withdrawals/batch', 'POST', {
+                    'ids': state['page_ids'],
+                    'action': action
+                })
+                if result is None:
+                    notice = "❌ Ошибка при обновлении заявок"
+                else:
+                    notice = f"✅ Обновлено заявок: {len(result['updated'])}, пропущено: {len(result['skipped'])}"
+            
+            text, reply_markup = await render_withdrawals(context)
+            if notice:
+                text = f"{notice}\n\n{text}"
+            await query.edit_message_text(text, reply_markup=reply_markup)
+        
+        elif data == "admin_stats":
+            stats = await make_api_request('admin/stats')
+            
+            stats = stats or {}
+            withdrawals = stats.get('withdrawals_by_status', {})
+            
+            text = (
+                f"📊 Статистика Ghost FluX\n\n"
+                f"👥 Пользователи: {stats.get('total_users', 'N/A')}\n"
+                f"🟢 Активны сегодня: {stats.get('dau', 'N/A')} (вчера {stats.get('dau_yesterday', 'N/A')})\n"
+                f"🎰 Спинов: {stats.get('total_spins', 'N/A')}\n"
+                f"💸 Поставлено: {stats.get('stars_wagered', 'N/A')}⭐ / выиграно: {stats.get('stars_won', 'N/A')}⭐\n"
+                f"🎁 Бонусов выдано: {stats.get('daily_bonus_stars', 'N/A')}⭐\n"
+                f"📤 Всего выводов: {stats.get('total_withdrawals', 'N/A')} "
+                f"(ожидают {withdrawals.get('pending', 0)}, выполнено {withdrawals.get('completed', 0)})\n"
+                f"👑 Админ: {ADMIN_USERNAME}"
+            )
+            
+            keyboard = [
+                [InlineKeyboardButton("🔄 Обновить", callback_data="admin_stats")],
+                [InlineKeyboardButton("📋 Главное меню", callback_data="admin_back")]
+            ]
+            reply_markup = InlineKeyboardMarkup(keyboard)
+            
+            await query.edit_message_text(text, reply_markup=reply_markup)
+        
+        elif data == "admin_add_stars":
+            text = (
+                "⭐ Добавление звёзд\n\n"
+                "Используйте команду:\n"
+                "/addstars user_id amount\n\n"
+                "Пример:\n"
+                "/addstars 123456789 100"
+            )
+            
+            keyboard = [
+                [InlineKeyboardButton("📋 Главное меню", callback_data="admin_back")]
+            ]
+            reply_markup = InlineKeyboardMarkup(keyboard)
+            
+            await query.edit_message_text(text, reply_markup=reply_markup)
+        
+        elif data == "admin_broadcast":
+            text = (
+                f"{broadcaster.status_text()}\n\n"
+                "Новая рассылка всем пользователям:\n"
+                "/broadcast текст сообщения\n\n"
+                "Остановить текущую: /broadcaststop"
+            )
+            
+            keyboard = [
+                [InlineKeyboardButton("🔄 Обновить", callback_data="admin_broadcast")],
+                [InlineKeyboardButton("📋 Главное меню", callback_data="admin_back")]
+            ]
+            reply_markup = InlineKeyboardMarkup(keyboard)
+            
+            await query.edit_message_text(text, reply_markup=reply_markup)
+        
+        elif data == "admin_back" or data == "admin_refresh":
+            await admin_panel(update, context)
+            
+    except Exception as e:
+        logger.error(f"Error in handle_admin_callback: {e}")
+        await query.edit_message_text("❌ Ошибка при обработке запроса")
+
+async def add_stars_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    try:
+        user_id = update.effective_user.id
+        if user_id != ADMIN_ID:
+            await update.message.reply_text("❌ Доступ запрещен")
+            return
+        
+        if len(context.args) != 2:
+            await update.message.reply_text(
+                "❌ Неправильный формат команды\n\n"
+                "Используйте: /addstars user_id amount\n"
+                "Пример: /addstars 123456789 100"
+            )
+            return
+        
+        target_user_id = int(context.args[0])
+        amount = int(context.args[1])
+        
+        result = await make_api_request('admin/add-stars', 'POST', {
+            'user_id': target_user_id,
+            'amount': amount
+        })
+        
+        if result:
+            await update.message.reply_text(
+                f"✅ Успешно добавлено {amount}⭐ пользователю {target_user_id}"
+            )
+            
+            # Пытаемся отправить уведомление пользователю
+            try:
+                await context.bot.send_message(
+                    chat_id=target_user_id,
+                    text=f"🎉 Вам начислено {amount}⭐ на баланс!\n\n💫 Новый баланс можно проверить в Mini App"
+                )
+            except Exception as e:
+                logger.warning(f"Could not notify user {target_user_id}: {e}")
+                
+        else:
+            await update.message.reply_text("❌ Ошибка при добавлении звёзд")
+            
+    except ValueError:
+        await update.message.reply_text("❌ Неверный формат ID или количества звёзд")
+    except Exception as e:
+        logger.error(f"Error in add_stars_command: {e}")
+        await update.message.reply_text("❌ Ошибка при выполнении команды")
+
+async def withdrawals_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """/withdrawals [status] [user_id] - очередь выводов с фильтрами"""
+    try:
+        if update.effective_user.id != ADMIN_ID:
+            await update.message.reply_text("❌ Доступ запрещен")
+            return
+        
+        state = get_withdrawals_state(context)
+        status = 'pending'
+        user_id = None
+        for arg in context.args:
+            if arg in WITHDRAWAL_FILTERS:
+                status = arg
+            else:
+                user_id = int(arg)
+        
+        state['status'] = status
+        state['user_id'] = user_id
+        state['cursors'] = [None]
+        
+        text, reply_markup = await render_withdrawals(context)
+        await update.message.reply_text(text, reply_markup=reply_markup)
+    
+    except ValueError:
+        await update.message.reply_text(
+            "❌ Используйте: /withdrawals [pending|approved|completed|all] [user_id]"
+        )
+    except Exception as e:
+        logger.error(f"Error in withdrawals_command: {e}")
+        await update.message.reply_text("❌ Ошибка при получении заявок")
+
+async def complete_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """/complete id [id ...] - завершить заявки на вывод одним запросом"""
+    try:
+        if update.effective_user.id != ADMIN_ID:
+            await update.message.reply_text("❌ Доступ запрещен")
+            return
+        
+        if not context.args:
+            await update.message.reply_text(
+                "❌ Используйте: /complete withdrawal_id [withdrawal_id ...]\n"
+                "Пример: /complete 12 13 14"
+            )
+            return
+        
+        ids = [int(arg) for arg in context.args]
+        result = await make_api_request('admin/withdrawals/batch', 'POST', {
+            'ids': ids,
+            'action': 'complete'
+        })
+        
+        if result is None:
+            await update.message.reply_text("❌ Ошибка при завершении заявок")
+            return
+        
+        text = f"✅ Завершено заявок: {len(result['updated'])}"
+        if result['skipped']:
+            text += f"\nПропущены (нет или уже завершены): {', '.join(map(str, result['skipped']))}"
+        await update.message.reply_text(text)
+    
+    except ValueError:
+        await update.message.reply_text("❌ Неверный формат ID заявки")
+    except Exception as e:
+        logger.error(f"Error in complete_command: {e}")
+        await update.message.reply_text("❌ Ошибка при выполнении команды")
+
+async def broadcast_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """/broadcast текст - рассылка всем пользователям; без текста - состояние рассылки"""
+    try:
+        if update.effective_user.id != ADMIN_ID:
+            await update.message.reply_text("❌ Доступ запрещен")
+            return
+        
+        # Текст берём из сообщения целиком, чтобы сохранить переносы строк
+        parts = update.message.text.split(maxsplit=1)
+        if len(parts) < 2:
+            await update.message.reply_text(broadcaster.status_text())
+            return
+        
+        if broadcaster.start(context.job_queue, 'announce', parts[1]):
+            await update.message.reply_text("📣 Рассылка запущена. Состояние: /broadcast")
+        else:
+            await update.message.reply_text("❌ Уже идёт другая рассылка. Остановить: /broadcaststop")
+        
+    except Exception as e:
+        logger.error(f"Error in broadcast_command: {e}")
+        await update.message.reply_text("❌ Ошибка при запуске рассылки")
+
+async def broadcast_stop_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    if update.effective_user.id != ADMIN_ID:
+        await update.message.reply_text("❌ Доступ запрещен")
+        return
+    
+    if broadcaster.cancel():
+        await update.message.reply_text(f"⏹ Рассылка остановлена\n\n{broadcaster.status_text()}")
+    else:
+        await update.message.reply_text("📭 Сейчас рассылка не идёт")
+
+async def bonus_reminder_job(context: ContextTypes.DEFAULT_TYPE):
+    """Ежедневное напоминание тем, кому доступен бонус"""
+    if not broadcaster.start(context.job_queue, 'bonus', BONUS_REMINDER_TEXT):
+        logger.info("Bonus reminder skipped: another broadcast is running")
+
+async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Команда помощи"""
+    help_text = """
+🤖 Команды бота Ghost FluX:
+
+/start - Начать работу
+/help - Показать эту справку
+/stats - Моя статистика
+
+👑 Команды администратора:
+/admin - Панель управления
+/addstars user_id amount - Добавить звёзды
+/withdrawals [status] [user_id] - Заявки на вывод
+/complete withdrawal_id [...] - Завершить выводы
+/broadcast [текст] - Рассылка всем пользователям
+/broadcaststop - Остановить рассылку
+
+💫 Пополнение баланса:
+50⭐ = 85 руб | 100⭐ = 160 руб | 250⭐ = 400 руб
+Связь: @KXKXKXKXKXKXKXKXKXKXK
+    """
+    await update.message.reply_text(help_text)
+
+async def user_stats_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Команда для просмотра статистики пользователя"""
+    try:
+        user_id = update.effective_user.id
+        
+        # Определяем ID пользователя для статистики
+        if len(context.args) == 1 and update.effective_user.id == ADMIN_ID:
+            try:
+                target_user_id = int(context.args[0])
+            except ValueError:
+                target_user_id = user_id
+        else:
+            target_user_id = user_id
+        
+        profile = await make_api_request(f'profile/{target_user_id}?fields=user,stats')
+        
+        if profile:
+            user_data = profile['user']
+            stats = profile['stats']
+            username = user_data.get('username', 'Unknown')
+            balance = user_data.get('balance', 0)
+            
+            text = (
+                f"📊 Статистика пользователя @{username}\n\n"
+                f"🆔 ID: {target_user_id}\n"
+                f"⭐ Баланс: {balance}\n"
+                f"🎡 Спинов: {stats.get('spins_count', 0)}\n"
+                f"🏆 Всего выиграно: {stats.get('total_won', 0)}⭐\n"
+            )
+            
+            if stats.get('last_spin'):
+                text += f"⏰ Последний спин: {stats['last_spin'][:19]}"
+            
+            await update.message.reply_text(text)
+        else:
+            await update.message.reply_text("❌ Ошибка при получении статистики")
+            
+    except Exception as e:
+        logger.error(f"Error in user_stats_command: {e}")
+        await update.message.reply_text("❌ Ошибка при получении статистики")
+
+async def error_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Обработчик ошибок"""
+    try:
+        logger.error(f"Exception while handling an update: {context.error}", exc_info=context.error)
+        
+        # Более информативное сообщение об ошибке
+        error_message = f"""
+❌ Произошла техническая ошибка.
+
+Возможные причины:
+• Сервер временно недоступен
+• Проблемы с подключением
+• Технические работы
+
+Пожалуйста, попробуйте позже или свяжитесь с администратором: {ADMIN_USERNAME}
+        """
+        
+        if update and update.effective_message:
+            await update.effective_message.reply_text(error_message)
+    except Exception as e:
+        logger.error(f"Error in error handler: {e}")
+
+async def resume_broadcast(application: Application):
+    broadcaster.resume(application.job_queue)
+
+async def close_api_client(application: Application):
+    await api_client.close()
+
+def main():
+    try:
+        logger.info("Starting Ghost FluX Casino Bot...")
+        logger.info(f"Admin ID: {ADMIN_ID}")
+        logger.info(f"WebApp URL: {WEBAPP_URL}")
+        
+        # Создаем приложение
+        application = (
+            Application.builder()
+            .token(BOT_TOKEN)
+            .concurrent_updates(True)
+            .post_init(resume_broadcast)
+            .post_shutdown(close_api_client)
+            .build()
+        )
+        
+        # Обработчики команд
+        application.add_handler(CommandHandler("start", start))
+        application.add_handler(CommandHandler("help", help_command))
+        application.add_handler(CommandHandler("admin", admin_panel))
+        application.add_handler(CommandHandler("addstars", add_stars_command))
+        application.add_handler(CommandHandler("stats", user_stats_command))
+        application.add_handler(CommandHandler("withdrawals", withdrawals_command))
+        application.add_handler(CommandHandler("complete", complete_command))
+        application.add_handler(CommandHandler("broadcast", broadcast_command))
+        application.add_handler(CommandHandler("broadcaststop", broadcast_stop_command))
+        
+        if BONUS_REMINDER_TIME:
+            hour, minute = map(int, BONUS_REMINDER_TIME.split(':'))
+            application.job_queue.run_daily(
+                bonus_reminder_job,
+                dt_time(hour, minute, tzinfo=timezone.utc),
+                name='bonus_reminder'
+            )
+        
+        # Обработчики callback запросов
+        application.add_handler(CallbackQueryHandler(handle_admin_callback, pattern="^admin_"))
+        
+        # Обработчик ошибок
+        application.add_error_handler(error_handler)
+        
+        logger.info("Bot started successfully!")
+        application.run_polling()
+        
+    except Exception as e:
+        logger.error(f"Failed to start bot: {e}")
+
+if __name__ == '__main__':
     main()
\ No newline at end of file
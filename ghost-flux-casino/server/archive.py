@@ -0,0 +1,193 @@
+"""Архивация журнала транзакций по месяцам в отдельные файлы SQLite.
+
+Записи transactions старше горизонта (ARCHIVE_HORIZON_DAYS, целыми месяцами)
+переносятся в archive/ledger-YYYY-MM.db рядом с основной БД. Вместо них
+в основной БД остаются итоги (ledger_archive_summary: месяц, пользователь,
+тип, число записей, сумма), а список архивов - в ledger_archives.
+Балансы, статистика и счётчики от журнала не зависят, агрегаты
+(rollups.py) обновляются до переноса, поэтому после архивации они не меняются.
+
+Перенос идёт пачками: пачка сначала коммитится в архив (INSERT OR IGNORE
+по id), затем одной транзакцией основной БД добавляются итоги и удаляются
+те же строки. Прерванную архивацию можно просто запустить заново.
+Запуск из cron:
+
+    python archive.py [путь к БД] [--horizon-days N] [--vacuum]
+
+Архивы открываются только на чтение по запросу (export.py), а итоги
+по пользователю отдаются в разделе archived профиля (/api/profile).
+"""
+import os
+import sqlite3
+import logging
+import argparse
+from datetime import date, datetime, timedelta, timezone
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_DIR = 'archive'
+ARCHIVE_HORIZON_DAYS = 90
+ARCHIVE_CHUNK = 20000
+
+ARCHIVE_COLUMNS = 'id, user_id, type, amount, description, created_at'
+
+ARCHIVE_SCHEMA = [
+    '''CREATE TABLE IF NOT EXISTS transactions (
+        id INTEGER PRIMARY KEY,
+        user_id INTEGER,
+        type TEXT,
+        amount INTEGER,
+        description TEXT,
+        created_at DATETIME
+    )''',
+    'CREATE INDEX IF NOT EXISTS idx_transactions_created ON transactions (created_at)',
+    'CREATE INDEX IF NOT EXISTS idx_transactions_type_created ON transactions (type, created_at)',
+    'CREATE INDEX IF NOT EXISTS idx_transactions_user_created ON transactions (user_id, created_at)',
+]
+
+# Условие строк одной пачки: месяц [start, end), обработано агрегатами (id <= отметки)
+# и не дальше последней строки пачки по порядку (created_at, id)
+CHUNK_CONDITION = '''
+    created_at >= ? AND created_at < ? AND id <= ? AND (created_at, id) <= (?, ?)
+'''
+
+SUMMARY_UPSERT = f'''
+    INSERT INTO ledger_archive_summary (month, user_id, type, count, amount)
+    SELECT ?, IFNULL(user_id, 0), IFNULL(type, 'unknown'), COUNT(*), IFNULL(SUM(amount), 0)
+    FROM transactions
+    WHERE {CHUNK_CONDITION}
+    GROUP BY 2, 3
+    ON CONFLICT(month, user_id, type) DO UPDATE SET
+        count = count + excluded.count,
+        amount = amount + excluded.amount
+'''
+
+def month_bounds(month):
+    """'YYYY-MM' -> ('YYYY-MM-01', первое число следующего месяца)"""
+    start = date.fromisoformat(f'{month}-01')
+    end = (start + timedelta(days=32)).replace(day=1)
+    return start.isoformat(), end.isoformat()
+
+def archive_cutoff(horizon_days, now=None):
+    """Первое число месяца, в который попадает горизонт: более ранние месяцы архивируются целиком"""
+    now = now or datetime.now(timezone.utc)
+    return (now - timedelta(days=horizon_days)).date().replace(day=1).isoformat()
+
+def open_readonly(path):
+    return sqlite3.connect(f'file:{path}?mode=ro', uri=True, check_same_thread=False)
+
+class LedgerArchive:
+    def __init__(self, pool, rollups, directory=None, chunk=ARCHIVE_CHUNK):
+        self.pool = pool
+        self.rollups = rollups
+        self.directory = directory or os.path.join(os.path.dirname(os.path.abspath(pool.path)), ARCHIVE_DIR)
+        self.chunk = chunk
+
+    def path(self, month):
+        return os.path.join(self.directory, f'ledger-{month}.db')
+
+    def open_month(self, month):
+        """Файл архива месяца на запись (создаётся при первом обращении)"""
+        os.makedirs(self.directory, exist_ok=True)
+        conn = sqlite3.connect(self.path(month))
+        # Пачка должна лечь на диск до удаления строк из основной БД
+        conn.execute('PRAGMA synchronous = FULL')
+        for statement in ARCHIVE_SCHEMA:
+            conn.execute(statement)
+        conn.commit()
+        return conn
+
+    def archive(self, horizon_days=ARCHIVE_HORIZON_DAYS):
+        """Переносит в архивы все месяцы до горизонта; возвращает {месяц: перенесено строк}"""
+        cutoff = archive_cutoff(horizon_days)
+        # Агрегаты должны учесть строки до того, как они уйдут из основной БД
+        high_water = self.rollups.refresh()
+
+        moved = {}
+        start = ''
+        while True:
+            first = self.pool.reader().execute(
+                'SELECT MIN(created_at) FROM transactions WHERE created_at >= ? AND created_at < ?',
+                (start, cutoff)
+            ).fetchone()[0]
+            if first is None:
+                break
+            month = first[:7]
+            moved[month] = self.archive_month(month, high_water)
+            start = month_bounds(month)[1]
+        return moved
+
+    def archive_month(self, month, high_water):
+        start, end = month_bounds(month)
+        archive_conn = None
+        total = 0
+        try:
+            while True:
+                rows = self.pool.reader().execute(
+                    f'''SELECT {ARCHIVE_COLUMNS} FROM transactions
+                        WHERE created_at >= ? AND created_at < ? AND id <= ?
+                        ORDER BY created_at, id LIMIT ?''',
+                    (start, end, high_water, self.chunk)
+                ).fetchall()
+                if not rows:
+                    break
+
+                if archive_conn is None:
+                    archive_conn = self.open_month(month)
+                with archive_conn:
+                    archive_conn.executemany(
+                        f'INSERT OR IGNORE INTO transactions ({ARCHIVE_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?)',
+                        rows
+                    )
+
+                last_id, last_created = rows[-1][0], rows[-1][5]
+                condition = (start, end, high_water, last_created, last_id)
+                with self.pool.writer() as conn:
+                    conn.execute(SUMMARY_UPSERT, (month,) + condition)
+                    cursor = conn.execute(f'DELETE FROM transactions WHERE {CHUNK_CONDITION}', condition)
+                    conn.execute('''
+                        INSERT INTO ledger_archives (month, file, rows) VALUES (?, ?, ?)
+                        ON CONFLICT(month) DO UPDATE SET
+                            rows = rows + excluded.rows,
+                            archived_at = CURRENT_TIMESTAMP
+                    ''', (month, os.path.basename(self.path(month)), cursor.rowcount))
+                total += cursor.rowcount
+                logger.info(f"Archived {total} transactions of {month}")
+        finally:
+            if archive_conn is not None:
+                archive_conn.close()
+        return total
+
+    def months(self, since=None, until=None):
+        """Архивы месяцев, пересекающихся с [since, until), по возрастанию: [(месяц, путь)]"""
+        result = []
+        for month, file in self.pool.reader().execute('SELECT month, file FROM ledger_archives ORDER BY month'):
+            start, end = month_bounds(month)
+            if (since and end <= since) or (until and start >= until):
+                continue
+            result.append((month, os.path.join(self.directory, file)))
+        return result
+
+    def vacuum(self):
+        """Возвращает освободившееся место файлу основной БД (долгая блокировка записи)"""
+        with self.pool.write_lock:
+            self.pool.writer_conn.execute('VACUUM')
+
+if __name__ == '__main__':
+    from database import Database, DB_PATH
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description='Archive old ledger rows into per-month files')
+    parser.add_argument('db_path', nargs='?', default=DB_PATH)
+    parser.add_argument('--horizon-days', type=int, default=ARCHIVE_HORIZON_DAYS)
+    parser.add_argument('--vacuum', action='store_true', help='shrink the main database file afterwards')
+    args = parser.parse_args()
+
+    db = Database(args.db_path, ledger_mode='sync')
+    moved = db.archive.archive(args.horizon_days)
+    for month, count in moved.items():
+        print(f"{month}: {count} transactions archived")
+    if not moved:
+        print("Nothing to archive")
+    if args.vacuum:
+        db.archive.vacuum()
+    db.close()
@@ -0,0 +1,238 @@
+"""Асинхронный вариант API (ASGI) с теми же маршрутами и телами ответов, что в app.py.
+
+Запросы ждут SQLite в ограниченном пуле потоков (AsyncCasinoService),
+поэтому тысячи одновременных сессий Mini App не держат по потоку каждая:
+
+    cd server && uvicorn asgi:app --host 0.0.0.0 --port 5000 --workers 4
+    cd server && GUNICORN_APP=asgi gunicorn -c gunicorn.conf.py
+"""
+import logging
+from contextlib import asynccontextmanager
+from datetime import datetime
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.responses import Response, StreamingResponse
+from starlette.routing import Route
+from database import Database
+from services import (
+    CasinoService, AsyncCasinoService, INVENTORY_PAGE_SIZE, WITHDRAWALS_PAGE_SIZE,
+    RECIPIENTS_PAGE_SIZE, dump_json
+)
+
+# Настройка логирования
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+# Инициализация базы данных
+db = Database()
+service = AsyncCasinoService(CasinoService(db))
+
+class JSONResponse(Response):
+    media_type = 'application/json'
+
+    def render(self, content):
+        return dump_json(content)
+
+def respond(result):
+    body, status = result
+    return JSONResponse(body, status_code=status)
+
+async def read_json(request):
+    # Аналог request.get_json(silent=True) во Flask
+    try:
+        return await request.json()
+    except ValueError:
+        return None
+
+def etag_matches(header, etag):
+    for value in header.split(','):
+        value = value.strip()
+        if value == '*' or value.removeprefix('W/').strip('"') == etag:
+            return True
+    return False
+
+async def home(request):
+    return JSONResponse({
+        "status": "online",
+        "message": "Ghost FluX Casino API",
+        "version": "1.0.0"
+    })
+
+async def health_check(request):
+    return JSONResponse({"status": "healthy", "timestamp": datetime.now().isoformat()})
+
+async def get_user(request):
+    return respond(await service.get_user(request.path_params['user_id']))
+
+async def get_profile(request):
+    user_id = request.path_params['user_id']
+    return respond(await service.get_profile(user_id, request.query_params.get('fields')))
+
+async def register_user(request):
+    return respond(await service.register_user(await read_json(request)))
+
+async def daily_bonus(request):
+    return respond(await service.daily_bonus(await read_json(request)))
+
+async def spin_roulette(request):
+    data = await read_json(request)
+    return respond(await service.spin_roulette(data, request.headers.get('Idempotency-Key')))
+
+async def spin_roulette_batch(request):
+    data = await read_json(request)
+    return respond(await service.spin_roulette_batch(data, request.headers.get('Idempotency-Key')))
+
+async def get_user_inventory(request):
+    result, status = await service.get_inventory(
+        request.path_params['user_id'],
+        request.query_params.get('view', 'items'),
+        request.query_params.get('limit', INVENTORY_PAGE_SIZE),
+        request.query_params.get('cursor')
+    )
+    if status != 200:
+        return JSONResponse(result, status_code=status)
+
+    body, etag, next_cursor = result
+    headers = {'ETag': f'"{etag}"'}
+    if next_cursor:
+        headers['X-Next-Cursor'] = next_cursor
+    if etag_matches(request.headers.get('if-none-match', ''), etag):
+        return Response(status_code=304, headers=headers)
+    return Response(body, headers=headers, media_type='application/json')
+
+async def withdraw_item(request):
+    data = await read_json(request)
+    return respond(await service.withdraw_item(data, request.headers.get('Idempotency-Key')))
+
+async def get_withdrawals(request):
+    return respond(await service.get_withdrawals(
+        request.query_params.get('status', 'pending'),
+        request.query_params.get('user_id'),
+        request.query_params.get('since'),
+        request.query_params.get('until'),
+        request.query_params.get('limit', WITHDRAWALS_PAGE_SIZE),
+        request.query_params.get('cursor')
+    ))
+
+async def update_withdrawals(request):
+    return respond(await service.update_withdrawals(await read_json(request)))
+
+async def add_stars(request):
+    data = await read_json(request)
+    return respond(await service.add_stars(data, request.headers.get('Idempotency-Key')))
+
+async def get_admin_stats(request):
+    return respond(await service.get_admin_stats())
+
+async def get_rollups(request):
+    return respond(await service.get_rollups(
+        request.query_params.get('bucket', 'day'),
+        request.query_params.get('since'),
+        request.query_params.get('until'),
+        request.query_params.get('type')
+    ))
+
+async def get_bonus_claimable(request):
+    return respond(await service.get_bonus_claimable(
+        request.query_params.get('limit', RECIPIENTS_PAGE_SIZE),
+        request.query_params.get('cursor')
+    ))
+
+async def get_user_ids(request):
+    return respond(await service.get_user_ids(
+        request.query_params.get('limit', RECIPIENTS_PAGE_SIZE),
+        request.query_params.get('cursor')
+    ))
+
+async def get_archives(request):
+    return respond(await service.get_archives())
+
+async def export(request):
+    result, status = await service.export(
+        request.path_params['table'],
+        request.query_params.get('format', 'csv'),
+        request.query_params.get('gzip'),
+        request.query_params.get('since'),
+        request.query_params.get('until'),
+        request.query_params.get('type'),
+        request.query_params.get('status'),
+        request.query_params.get('user_id')
+    )
+    if status != 200:
+        return JSONResponse(result, status_code=status)
+    
+    # Синхронный генератор Starlette читает в пуле потоков, не блокируя цикл событий
+    chunks, content_type, filename = result
+    return StreamingResponse(chunks, media_type=content_type, headers={
+        'Content-Disposition': f'attachment; filename="{filename}"'
+    })
+
+async def complete_withdrawal(request):
+    return respond(await service.complete_withdrawal(request.path_params['withdrawal_id']))
+
+async def get_user_game_stats(request):
+    return respond(await service.get_user_game_stats(request.path_params['user_id']))
+
+# Обработка ошибок
+async def not_found(request, exc):
+    return JSONResponse({"error": "Endpoint not found"}, status_code=404)
+
+async def internal_error(request, exc):
+    return JSONResponse({"error": "Internal server error"}, status_code=500)
+
+async def method_not_allowed(request, exc):
+    return JSONResponse({"error": "Method not allowed"}, status_code=405)
+
+@asynccontextmanager
+async def lifespan(app):
+    yield
+    # Дожидаемся запросов в пуле и дописываем отложенный журнал транзакций
+    service.close()
+    db.close()
+
+routes = [
+    Route('/', home),
+    Route('/api/health', health_check, methods=['GET']),
+    Route('/api/user/{user_id:int}', get_user, methods=['GET']),
+    Route('/api/profile/{user_id:int}', get_profile, methods=['GET']),
+    Route('/api/register', register_user, methods=['POST']),
+    Route('/api/daily-bonus', daily_bonus, methods=['POST']),
+    Route('/api/spin-roulette', spin_roulette, methods=['POST']),
+    Route('/api/spin-roulette/batch', spin_roulette_batch, methods=['POST']),
+    Route('/api/inventory/{user_id:int}', get_user_inventory, methods=['GET']),
+    Route('/api/withdraw', withdraw_item, methods=['POST']),
+    Route('/api/admin/withdrawals', get_withdrawals, methods=['GET']),
+    Route('/api/admin/withdrawals/batch', update_withdrawals, methods=['POST']),
+    Route('/api/admin/add-stars', add_stars, methods=['POST']),
+    Route('/api/admin/stats', get_admin_stats, methods=['GET']),
+    Route('/api/admin/rollups', get_rollups, methods=['GET']),
+    Route('/api/admin/bonus-claimable', get_bonus_claimable, methods=['GET']),
+    Route('/api/admin/user-ids', get_user_ids, methods=['GET']),
+    Route('/api/admin/archives', get_archives, methods=['GET']),
+    Route('/api/admin/export/{table}', export, methods=['GET']),
+    Route('/api/admin/complete-withdrawal/{withdrawal_id:int}', complete_withdrawal, methods=['POST']),
+    Route('/api/user/stats/{user_id:int}', get_user_game_stats, methods=['GET']),
+]
+
+app = Starlette(
+    routes=routes,
+    middleware=[
+        Middleware(
+            CORSMiddleware,
+            allow_origins=['*'],
+            allow_methods=['*'],
+            allow_headers=['*'],
+            expose_headers=['ETag', 'X-Next-Cursor']
+        )
+    ],
+    exception_handlers={
+        404: not_found,
+        405: method_not_allowed,
+        500: internal_error
+    },
+    lifespan=lifespan
+)
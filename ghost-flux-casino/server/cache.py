@@ -0,0 +1,151 @@
+import time
+import threading
+from collections import OrderedDict
+
+INVENTORY_CACHE_USERS = 10000
+INVENTORY_CACHE_PAGES = 16
+INVENTORY_CACHE_TTL = 5
+
+class InventoryCache:
+    """LRU кэш готовых ответов /api/inventory по пользователям.
+
+    Любое изменение инвентаря сбрасывает все страницы пользователя.
+    Чтобы не положить в кэш ответ, прочитанный до изменения, запись
+    делается только с токеном, полученным до чтения из БД.
+    Изменения из других процессов (воркеры gunicorn) сюда не доходят,
+    поэтому страницы пользователя живут не дольше ttl секунд.
+    user_id приводится к int: из JSON запросов он может прийти строкой,
+    а чтение кэширует по числу из пути /api/inventory/<id>.
+    """
+
+    def __init__(self, max_users=INVENTORY_CACHE_USERS, max_pages=INVENTORY_CACHE_PAGES,
+                 ttl=INVENTORY_CACHE_TTL):
+        self.max_users = max_users
+        self.max_pages = max_pages
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+
+    def token(self, user_id):
+        user_id = int(user_id)
+        with self.lock:
+            entry = self.entries.get(user_id)
+            if entry is None or entry[2] < time.monotonic():
+                entry = (object(), OrderedDict(), time.monotonic() + self.ttl)
+                self.entries[user_id] = entry
+                self.entries.move_to_end(user_id)
+                if len(self.entries) > self.max_users:
+                    self.entries.popitem(last=False)
+            return entry[0]
+
+    def get(self, user_id, key):
+        user_id = int(user_id)
+        with self.lock:
+            entry = self.entries.get(user_id)
+            if entry is None or entry[2] < time.monotonic():
+                return None
+            self.entries.move_to_end(user_id)
+            return entry[1].get(key)
+
+    def put(self, user_id, token, key, value):
+        user_id = int(user_id)
+        with self.lock:
+            entry = self.entries.get(user_id)
+            if entry is None or entry[0] is not token:
+                return
+            pages = entry[1]
+            pages[key] = value
+            pages.move_to_end(key)
+            if len(pages) > self.max_pages:
+                pages.popitem(last=False)
+
+    def invalidate(self, user_id):
+        user_id = int(user_id)
+        with self.lock:
+            self.entries.pop(user_id, None)
+
+USER_CACHE_SIZE = 50000
+USER_CACHE_TTL = 10
+
+class CachedUser:
+    __slots__ = ('user_id', 'username', 'balance', 'last_daily_bonus', 'created_at', 'expires_at')
+
+    def __init__(self, row, expires_at):
+        self.user_id, self.username, self.balance, self.last_daily_bonus, self.created_at = row
+        self.expires_at = expires_at
+
+    def as_dict(self):
+        return {
+            'user_id': self.user_id,
+            'username': self.username,
+            'balance': self.balance,
+            'last_daily_bonus': self.last_daily_bonus,
+            'created_at': self.created_at
+        }
+
+class UserCache:
+    """LRU кэш строк users с TTL и счётчиками попаданий.
+
+    Записи в БД кладут в кэш свежую строку после коммита (store), а чтения
+    из БД - только если записи ещё нет (fill), поэтому ответ SELECT,
+    устаревший на момент вставки, не затирает результат записи.
+    TTL ограничивает расхождение с изменениями из других процессов.
+    Ключ - user_id, приведённый к int, как в InventoryCache.
+    """
+
+    def __init__(self, max_size=USER_CACHE_SIZE, ttl=USER_CACHE_TTL):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, user_id):
+        try:
+            user_id = int(user_id)
+        except (TypeError, ValueError):
+            # Такого id нет в users - строки там только с целыми user_id
+            return None
+        with self.lock:
+            record = self.entries.get(user_id)
+            if record is None or record.expires_at < time.monotonic():
+                self.misses += 1
+                return None
+            self.entries.move_to_end(user_id)
+            self.hits += 1
+            return record.as_dict()
+
+    def store(self, row, replace=True):
+        user_id = int(row[0])
+        with self.lock:
+            existing = self.entries.get(user_id)
+            if not replace and existing is not None and existing.expires_at >= time.monotonic():
+                return
+            if existing is None:
+                self.entries[user_id] = CachedUser(row, time.monotonic() + self.ttl)
+            else:
+                # Обновляем запись на месте, без новой аллокации
+                existing.user_id, existing.username, existing.balance, existing.last_daily_bonus, existing.created_at = row
+                existing.expires_at = time.monotonic() + self.ttl
+            self.entries.move_to_end(user_id)
+            if len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+    def fill(self, row):
+        self.store(row, replace=False)
+
+    def invalidate(self, user_id):
+        user_id = int(user_id)
+        with self.lock:
+            self.entries.pop(user_id, None)
+
+    def stats(self):
+        with self.lock:
+            total = self.hits + self.misses
+            return {
+                'size': len(self.entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / total, 4) if total else 0.0
+            }
@@ -1,126 +1,800 @@
-import sqlite3
-import json
-from datetime import datetime, timedelta
-
-class Database:
-    def __init__(self):
-        self.conn = sqlite3.connect('ghost_flux.db', check_same_thread=False)
-        self.create_tables()
-    
-    def create_tables(self):
-        cursor = self.conn.cursor()
-        
-        # Пользователи
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS users (
-                user_id INTEGER PRIMARY KEY,
-                username TEXT,
-                balance INTEGER DEFAULT 0,
-                last_daily_bonus DATETIME,
-                created_at DATETIME DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        
-        # Инвентарь
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS inventory (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id INTEGER,
-                item_name TEXT,
-                item_value INTEGER,
-                created_at DATETIME DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        
-        # Выводы
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS withdrawals (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id INTEGER,
-                username TEXT,
-                item_name TEXT,
-                item_value INTEGER,
-                status TEXT DEFAULT 'pending',
-                created_at DATETIME DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        
-        # Транзакции
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS transactions (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id INTEGER,
-                type TEXT,
-                amount INTEGER,
-                created_at DATETIME DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        
-        self.conn.commit()
-    
-    def get_user(self, user_id):
-        cursor = self.conn.cursor()
-        cursor.execute('SELECT * FROM users WHERE user_id = ?', (user_id,))
-        user = cursor.fetchone()
-        if user:
-            return {
-                'user_id': user[0],
-                'username': user[1],
-                'balance': user[2],
-                'last_daily_bonus': user[3]
-            }
-        return None
-    
-    def create_user(self, user_id, username):
-        cursor = self.conn.cursor()
-        cursor.execute(
-            'INSERT OR IGNORE INTO users (user_id, username) VALUES (?, ?)',
-            (user_id, username)
-        )
-        self.conn.commit()
-    
-    def update_balance(self, user_id, amount):
-        cursor = self.conn.cursor()
-        cursor.execute(
-            'UPDATE users SET balance = balance + ? WHERE user_id = ?',
-            (amount, user_id)
-        )
-        self.conn.commit()
-    
-    def add_to_inventory(self, user_id, item_name, item_value):
-        cursor = self.conn.cursor()
-        cursor.execute(
-            'INSERT INTO inventory (user_id, item_name, item_value) VALUES (?, ?, ?)',
-            (user_id, item_name, item_value)
-        )
-        self.conn.commit()
-    
-    def get_inventory(self, user_id):
-        cursor = self.conn.cursor()
-        cursor.execute(
-            'SELECT * FROM inventory WHERE user_id = ? ORDER BY created_at DESC',
-            (user_id,)
-        )
-        return cursor.fetchall()
-    
-    def create_withdrawal(self, user_id, username, item_name, item_value):
-        cursor = self.conn.cursor()
-        cursor.execute(
-            'INSERT INTO withdrawals (user_id, username, item_name, item_value) VALUES (?, ?, ?, ?)',
-            (user_id, username, item_name, item_value)
-        )
-        self.conn.commit()
-        return cursor.lastrowid
-    
-    def get_pending_withdrawals(self):
-        cursor = self.conn.cursor()
-        cursor.execute('SELECT * FROM withdrawals WHERE status = "pending" ORDER BY created_at DESC')
-        return cursor.fetchall()
-    
-    def update_withdrawal_status(self, withdrawal_id, status):
-        cursor = self.conn.cursor()
-        cursor.execute(
-            'UPDATE withdrawals SET status = ? WHERE id = ?',
-            (status, withdrawal_id)
-        )
-        self.conn.commit()
\ No newline at end of file
+import os
+import sqlite3
+import atexit
+import logging
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from migrations import migrate
+from ledger import LedgerBuffer, LEDGER_MODES
+from cache import InventoryCache, UserCache
+from rollups import LedgerRollups
+from archive import LedgerArchive
+
+logger = logging.getLogger(__name__)
+
+DB_PATH = 'ghost_flux.db'
+
+# Настройки SQLite: WAL позволяет читать параллельно с записью,
+# synchronous=NORMAL в режиме WAL не теряет целостность и не делает fsync на каждый коммит
+JOURNAL_MODE = 'WAL'
+SYNCHRONOUS = 'NORMAL'
+BUSY_TIMEOUT_MS = 5000
+
+# Журнал транзакций пишется фоновым потоком пачками ('buffered')
+# или сразу в запросе ('sync'), см. ledger.py
+LEDGER_MODE = 'buffered'
+
+USER_COLUMNS = 'user_id, username, balance, last_daily_bonus, created_at'
+
+# Разделы профиля (/api/profile) и число последних записей журнала в нём;
+# archived - итоги месяцев журнала, перенесённых в архивы (archive.py)
+PROFILE_FIELDS = ('user', 'stats', 'inventory', 'transactions', 'archived')
+PROFILE_RECENT_TRANSACTIONS = 10
+
+# Предметы складываются в стопку: одна строка на (user_id, item_name, item_value)
+# с количеством; после смены ценности приза новые выигрыши идут в новую стопку,
+# а уже выигранные предметы сохраняют свою ценность
+INVENTORY_UPSERT = '''
+    INSERT INTO inventory (user_id, item_name, item_value, quantity) VALUES (?, ?, ?, ?)
+    ON CONFLICT(user_id, item_name, item_value) DO UPDATE SET
+        quantity = quantity + excluded.quantity,
+        updated_at = CURRENT_TIMESTAMP
+'''
+
+# Спины в статистике: вставка новой строки или инкремент существующей
+GAME_STATS_UPSERT = '''
+    INSERT INTO game_stats (user_id, spins_count, total_won, last_spin) VALUES (?, ?, ?, ?)
+    ON CONFLICT(user_id) DO UPDATE SET
+        spins_count = spins_count + excluded.spins_count,
+        total_won = total_won + excluded.total_won,
+        last_spin = excluded.last_spin
+'''
+
+# Соединения, унаследованные от родителя при fork. SQLite запрещает
+# использовать их в дочернем процессе, а закрытие может задеть файлы БД
+# родителя, поэтому ссылки просто держим до выхода из процесса
+INHERITED_CONNECTIONS = []
+
+class ConnectionPool:
+    """Соединения с SQLite: своё соединение для чтения в каждом потоке
+    и одно соединение для записи, доступ к которому сериализован блокировкой.
+    
+    Соединения открываются при первом использовании, поэтому после close()
+    пул можно использовать дальше: так мастер gunicorn закрывает свои
+    соединения перед fork, а каждый воркер открывает собственные.
+    """
+    
+    def __init__(self, path=DB_PATH):
+        self.path = path
+        self.open_pool()
+        with self.write_lock:
+            self.writer_conn.execute(f'PRAGMA journal_mode = {JOURNAL_MODE}')
+    
+    def open_pool(self):
+        self.local = threading.local()
+        self.write_lock = threading.RLock()
+        # Глубина вложенных writer() и поток, который держит write_lock
+        self.write_depth = 0
+        self.write_owner = None
+        self.write_connection = None
+    
+    @property
+    def writer_conn(self):
+        """Соединение для записи; использовать только под write_lock"""
+        if self.write_connection is None:
+            self.write_connection = self.connect()
+        return self.write_connection
+    
+    def connect(self, readonly=False):
+        conn = sqlite3.connect(
+            self.path,
+            timeout=BUSY_TIMEOUT_MS / 1000,
+            check_same_thread=False
+        )
+        conn.execute(f'PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}')
+        conn.execute(f'PRAGMA synchronous = {SYNCHRONOUS}')
+        if readonly:
+            conn.execute('PRAGMA query_only = 1')
+        return conn
+    
+    def after_fork(self):
+        """Вызывается в дочернем процессе: соединения и блокировки родителя заменяются новыми"""
+        if self.write_connection is not None:
+            INHERITED_CONNECTIONS.append(self.write_connection)
+        # Из потоков родителя в дочернем процессе остаётся только тот, что вызвал fork
+        conn = getattr(self.local, 'conn', None)
+        if conn is not None:
+            INHERITED_CONNECTIONS.append(conn)
+        self.open_pool()
+    
+    def reader(self):
+        """Соединение для чтения, закреплённое за текущим потоком"""
+        conn = getattr(self.local, 'conn', None)
+        if conn is None:
+            conn = self.connect(readonly=True)
+            self.local.conn = conn
+        return conn
+    
+    @contextmanager
+    def snapshot(self):
+        """Несколько чтений одной транзакцией: все запросы видят один и тот же снимок БД"""
+        conn = self.reader()
+        conn.execute('BEGIN')
+        try:
+            yield conn
+        finally:
+            conn.commit()
+    
+    @contextmanager
+    def writer(self):
+        """Транзакция на запись: BEGIN IMMEDIATE, commit при успехе, rollback при ошибке.
+        
+        Вложенные вызовы в том же потоке выполняются внутри внешней транзакции
+        через SAVEPOINT: ошибка во вложенном блоке откатывает только его изменения.
+        """
+        with self.write_lock:
+            conn = self.writer_conn
+            if self.write_depth:
+                savepoint = f'writer_{self.write_depth}'
+                conn.execute(f'SAVEPOINT {savepoint}')
+                self.write_depth += 1
+                try:
+                    yield conn
+                except BaseException:
+                    conn.execute(f'ROLLBACK TO {savepoint}')
+                    conn.execute(f'RELEASE {savepoint}')
+                    raise
+                else:
+                    conn.execute(f'RELEASE {savepoint}')
+                finally:
+                    self.write_depth -= 1
+                return
+            conn.execute('BEGIN IMMEDIATE')
+            self.write_depth = 1
+            self.write_owner = threading.get_ident()
+            try:
+                yield conn
+                conn.commit()
+            except BaseException:
+                # В том числе неудачный commit (SQLITE_BUSY): транзакция
+                # не должна остаться открытой для следующих writer()
+                if conn.in_transaction:
+                    conn.rollback()
+                raise
+            finally:
+                self.write_depth = 0
+                self.write_owner = None
+    
+    def owns_writer(self):
+        """True внутри writer() текущего потока: его записи попадут в открытую транзакцию"""
+        return self.write_owner == threading.get_ident()
+    
+    def close(self):
+        """Закрывает соединение записи и соединение чтения текущего потока"""
+        with self.write_lock:
+            if self.write_connection is not None:
+                self.write_connection.close()
+                self.write_connection = None
+        conn = getattr(self.local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self.local.conn = None
+
+class Database:
+    """Доступ к БД казино.
+    
+    Объект можно создать до fork (gunicorn --preload): схема мигрируется
+    один раз, перед fork соединения закрываются (disconnect), а в каждом
+    воркере открываются заново при первом запросе; кэши и поток журнала
+    воркер создаёт свои.
+    """
+    
+    def __init__(self, path=DB_PATH, ledger_mode=LEDGER_MODE):
+        if ledger_mode not in LEDGER_MODES:
+            raise ValueError(f"Unknown ledger mode: {ledger_mode}")
+        self.pool = ConnectionPool(path)
+        self.migrate()
+        self.ledger = LedgerBuffer(self.pool) if ledger_mode == 'buffered' else None
+        self.inventory_cache = InventoryCache()
+        self.user_cache = UserCache()
+        self.rollups = LedgerRollups(self.pool)
+        self.archive = LedgerArchive(self.pool, self.rollups)
+        atexit.register(self.close)
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self.after_fork)
+    
+    def after_fork(self):
+        self.pool.after_fork()
+        # Записи журнала, оставшиеся в очереди родителя, допишет сам родитель
+        if self.ledger is not None:
+            self.ledger = LedgerBuffer(self.pool)
+        self.inventory_cache = InventoryCache()
+        self.user_cache = UserCache()
+    
+    def disconnect(self):
+        """Закрывает соединения процесса, не останавливая работу: следующие запросы
+        откроют новые. Мастер gunicorn вызывает это перед fork воркеров
+        (pre_fork в gunicorn.conf.py): SQLite запрещает переносить открытые соединения через fork"""
+        if self.ledger is not None:
+            self.ledger.flush()
+        self.pool.close()
+    
+    def close(self):
+        # Дописываем отложенные записи журнала перед остановкой
+        if self.ledger is not None:
+            self.ledger.close()
+            self.ledger = None
+        self.pool.close()
+    
+    def migrate(self):
+        version = migrate(self.pool)
+        logger.info(f"Database schema is at version {version}")
+    
+    def get_user(self, user_id):
+        user = self.user_cache.get(user_id)
+        if user is not None:
+            return user
+        cursor = self.pool.reader().cursor()
+        cursor.execute(f'SELECT {USER_COLUMNS} FROM users WHERE user_id = ?', (user_id,))
+        row = cursor.fetchone()
+        if row:
+            self.user_cache.fill(row)
+            return {
+                'user_id': row[0],
+                'username': row[1],
+                'balance': row[2],
+                'last_daily_bonus': row[3],
+                'created_at': row[4]
+            }
+        return None
+    
+    def invalidate_user(self, user_id):
+        """Сбрасывает кэши пользователя - например, после отката транзакции,
+        внутри которой они уже были обновлены"""
+        try:
+            user_id = int(user_id)
+        except (TypeError, ValueError):
+            return
+        self.user_cache.invalidate(user_id)
+        self.inventory_cache.invalidate(user_id)
+    
+    def fetch_user_row(self, conn, user_id):
+        """Строка пользователя внутри транзакции записи - для обновления кэша после коммита"""
+        return conn.execute(f'SELECT {USER_COLUMNS} FROM users WHERE user_id = ?', (user_id,)).fetchone()
+    
+    def create_user(self, user_id, username):
+        try:
+            with self.pool.writer() as conn:
+                conn.execute(
+                    'INSERT OR IGNORE INTO users (user_id, username) VALUES (?, ?)',
+                    (user_id, username)
+                )
+                row = self.fetch_user_row(conn, user_id)
+            self.user_cache.store(row)
+            logger.info(f"User created: {user_id} - {username}")
+            return True
+        except Exception as e:
+            logger.error(f"Error creating user: {e}")
+            return False
+    
+    def update_balance(self, user_id, amount):
+        try:
+            with self.pool.writer() as conn:
+                conn.execute(
+                    'UPDATE users SET balance = balance + ? WHERE user_id = ?',
+                    (amount, user_id)
+                )
+                row = self.fetch_user_row(conn, user_id)
+            if row:
+                self.user_cache.store(row)
+            return True
+        except Exception as e:
+            logger.error(f"Error updating balance: {e}")
+            return False
+    
+    def claim_daily_bonus(self, user_id, bonus, claimed_at, cooldown):
+        """Начисляет бонус, если с прошлого прошло не меньше cooldown секунд.
+        
+        Проверка и начисление - один условный UPDATE, поэтому одновременные
+        запросы (в том числе из разных воркеров) не получат бонус дважды.
+        claimed_at и last_daily_bonus - секунды Unix.
+        Возвращает ('ok', новый баланс), ('too_early', время прошлого бонуса),
+        ('not_found', None) или ('error', None).
+        """
+        try:
+            with self.pool.writer() as conn:
+                cursor = conn.execute(
+                    '''UPDATE users SET balance = balance + ?, last_daily_bonus = ?
+                       WHERE user_id = ? AND (last_daily_bonus IS NULL OR last_daily_bonus <= ?)''',
+                    (bonus, claimed_at, user_id, claimed_at - cooldown)
+                )
+                if cursor.rowcount == 0:
+                    row = conn.execute(
+                        'SELECT last_daily_bonus FROM users WHERE user_id = ?', (user_id,)
+                    ).fetchone()
+                    return ('too_early', row[0]) if row else ('not_found', None)
+                row = self.fetch_user_row(conn, user_id)
+            self.user_cache.store(row)
+            return 'ok', row[2]
+        except Exception as e:
+            logger.error(f"Error claiming daily bonus: {e}")
+            return 'error', None
+    
+    def get_bonus_claimable(self, claimable_before, limit, after=None):
+        """Пользователи, которым доступен бонус (для напоминаний), страница по индексу.
+        
+        Сначала те, кто ни разу не получал бонус (last_daily_bonus NULL),
+        затем получавшие его не позже claimable_before - по возрастанию времени.
+        after - ключ (last_daily_bonus, user_id) последней строки предыдущей
+        страницы. Возвращает строки (user_id, last_daily_bonus) и ключ
+        следующей страницы (None, если это последняя).
+        """
+        cursor = self.pool.reader().cursor()
+        try:
+            rows = []
+            if after is None or after[0] is None:
+                cursor.execute(
+                    '''SELECT user_id, last_daily_bonus FROM users
+                       WHERE last_daily_bonus IS NULL AND user_id > ?
+                       ORDER BY user_id LIMIT ?''',
+                    (after[1] if after else -1, limit + 1)
+                )
+                rows = cursor.fetchall()
+                after = None
+            if len(rows) <= limit:
+                if after is None:
+                    cursor.execute(
+                        '''SELECT user_id, last_daily_bonus FROM users
+                           WHERE last_daily_bonus <= ?
+                           ORDER BY last_daily_bonus, user_id LIMIT ?''',
+                        (claimable_before, limit + 1 - len(rows))
+                    )
+                else:
+                    cursor.execute(
+                        '''SELECT user_id, last_daily_bonus FROM users
+                           WHERE last_daily_bonus <= ? AND (last_daily_bonus, user_id) > (?, ?)
+                           ORDER BY last_daily_bonus, user_id LIMIT ?''',
+                        (claimable_before, after[0], after[1], limit + 1)
+                    )
+                rows += cursor.fetchall()
+            if len(rows) > limit:
+                rows = rows[:limit]
+                return rows, (rows[-1][1], rows[-1][0])
+            return rows, None
+        except Exception as e:
+            logger.error(f"Error getting bonus claimable users: {e}")
+            return [], None
+    
+    def get_user_ids_page(self, limit, after=None):
+        """user_id по возрастанию после after (поиск по первичному ключу).
+        
+        Возвращает список id и ключ следующей страницы (None, если это последняя).
+        """
+        cursor = self.pool.reader().cursor()
+        try:
+            cursor.execute(
+                'SELECT user_id FROM users WHERE user_id > ? ORDER BY user_id LIMIT ?',
+                (after if after is not None else -1, limit + 1)
+            )
+            user_ids = [row[0] for row in cursor.fetchall()]
+            if len(user_ids) > limit:
+                user_ids = user_ids[:limit]
+                return user_ids, user_ids[-1]
+            return user_ids, None
+        except Exception as e:
+            logger.error(f"Error getting user ids page: {e}")
+            return [], None
+    
+    def add_transaction(self, user_id, type_, amount, description=""):
+        if self.ledger is not None:
+            self.ledger.add(user_id, type_, amount, description)
+            return True
+        try:
+            with self.pool.writer() as conn:
+                conn.execute(
+                    'INSERT INTO transactions (user_id, type, amount, description) VALUES (?, ?, ?, ?)',
+                    (user_id, type_, amount, description)
+                )
+            return True
+        except Exception as e:
+            logger.error(f"Error adding transaction: {e}")
+            return False
+    
+    def add_to_inventory(self, user_id, item_name, item_value, quantity=1):
+        try:
+            with self.pool.writer() as conn:
+                conn.execute(INVENTORY_UPSERT, (user_id, item_name, item_value, quantity))
+            self.inventory_cache.invalidate(user_id)
+            return True
+        except Exception as e:
+            logger.error(f"Error adding to inventory: {e}")
+            return False
+    
+    def get_inventory(self, user_id):
+        cursor = self.pool.reader().cursor()
+        try:
+            cursor.execute(
+                '''SELECT id, user_id, item_name, item_value, quantity, created_at, updated_at FROM inventory
+                   WHERE user_id = ? ORDER BY updated_at DESC, id DESC''',
+                (user_id,)
+            )
+            return cursor.fetchall()
+        except Exception as e:
+            logger.error(f"Error getting inventory: {e}")
+            return []
+    
+    def get_inventory_page(self, user_id, limit, after=None):
+        """Страница инвентаря от новых стопок к старым по ключу (created_at, id).
+        
+        Ключ не меняется при пополнении или выводе из стопки (в отличие от
+        updated_at), поэтому изменения во время листания не пропускают и не
+        повторяют строки. after - ключ последней строки предыдущей страницы.
+        Возвращает строки и ключ для следующей страницы (None, если это последняя).
+        """
+        cursor = self.pool.reader().cursor()
+        try:
+            if after is None:
+                cursor.execute(
+                    '''SELECT id, user_id, item_name, item_value, quantity, created_at, updated_at FROM inventory
+                       WHERE user_id = ?
+                       ORDER BY created_at DESC, id DESC LIMIT ?''',
+                    (user_id, limit + 1)
+                )
+            else:
+                cursor.execute(
+                    '''SELECT id, user_id, item_name, item_value, quantity, created_at, updated_at FROM inventory
+                       WHERE user_id = ? AND (created_at, id) < (?, ?)
+                       ORDER BY created_at DESC, id DESC LIMIT ?''',
+                    (user_id, after[0], after[1], limit + 1)
+                )
+            rows = cursor.fetchall()
+            if len(rows) > limit:
+                rows = rows[:limit]
+                return rows, (rows[-1][5], rows[-1][0])
+            return rows, None
+        except Exception as e:
+            logger.error(f"Error getting inventory page: {e}")
+            return [], None
+    
+    def get_inventory_summary(self, user_id):
+        cursor = self.pool.reader().cursor()
+        try:
+            cursor.execute(
+                '''SELECT item_name, item_value, SUM(quantity) FROM inventory
+                   WHERE user_id = ?
+                   GROUP BY item_name, item_value
+                   ORDER BY item_value DESC, item_name''',
+                (user_id,)
+            )
+            return cursor.fetchall()
+        except Exception as e:
+            logger.error(f"Error getting inventory summary: {e}")
+            return []
+    
+    def create_withdrawal(self, user_id, username, inventory_id=None, item_name=None):
+        """Заявка на вывод одного предмета из стопки одной транзакцией.
+        
+        Стопка выбирается по id строки инвентаря или, если id не передан,
+        по названию (самая старая из стопок с таким названием); ценность предмета
+        берётся из стопки. Списание из стопки, заявка и запись в журнале
+        коммитятся вместе, поэтому два одновременных вывода не заберут один предмет.
+        Возвращает ('ok', (withdrawal_id, item_name, item_value)),
+        ('no_item', None), ('not_found', None) или ('error', None).
+        """
+        try:
+            with self.pool.writer() as conn:
+                if inventory_id is not None:
+                    row = conn.execute(
+                        'SELECT id, item_name, item_value, quantity FROM inventory WHERE id = ? AND user_id = ?',
+                        (inventory_id, user_id)
+                    ).fetchone()
+                else:
+                    row = conn.execute(
+                        '''SELECT id, item_name, item_value, quantity FROM inventory
+                           WHERE user_id = ? AND item_name = ? AND quantity > 0
+                           ORDER BY id LIMIT 1''',
+                        (user_id, item_name)
+                    ).fetchone()
+                if row is None or row[3] <= 0:
+                    user = conn.execute('SELECT 1 FROM users WHERE user_id = ?', (user_id,)).fetchone()
+                    return ('no_item' if user else 'not_found'), None
+                
+                stack_id, item_name, item_value, quantity = row
+                if quantity > 1:
+                    conn.execute('UPDATE inventory SET quantity = quantity - 1 WHERE id = ?', (stack_id,))
+                else:
+                    conn.execute('DELETE FROM inventory WHERE id = ?', (stack_id,))
+                
+                cursor = conn.execute(
+                    'INSERT INTO withdrawals (user_id, username, item_name, item_value) VALUES (?, ?, ?, ?)',
+                    (user_id, username, item_name, item_value)
+                )
+                withdrawal_id = cursor.lastrowid
+                conn.execute(
+                    'INSERT INTO transactions (user_id, type, amount, description) VALUES (?, ?, ?, ?)',
+                    (user_id, "withdrawal", -(item_value or 0), f"Вывод: {item_name}")
+                )
+            self.inventory_cache.invalidate(user_id)
+            logger.info(f"Withdrawal created: ID {withdrawal_id} - User {username} - {item_name}")
+            return 'ok', (withdrawal_id, item_name, item_value)
+        except Exception as e:
+            logger.error(f"Error creating withdrawal: {e}")
+            return 'error', None
+    
+    def get_withdrawals_page(self, limit, status=None, user_id=None, since=None, until=None, after=None):
+        """Страница заявок на вывод от новых к старым по ключу (created_at, id).
+        
+        Фильтры необязательны: status, user_id и created_at в [since, until).
+        after - ключ последней строки предыдущей страницы. Возвращает строки
+        и ключ для следующей страницы (None, если это последняя).
+        """
+        conditions = []
+        params = []
+        if status:
+            conditions.append('status = ?')
+            params.append(status)
+        if user_id:
+            conditions.append('user_id = ?')
+            params.append(user_id)
+        if since:
+            conditions.append('created_at >= ?')
+            params.append(since)
+        if until:
+            conditions.append('created_at < ?')
+            params.append(until)
+        if after is not None:
+            conditions.append('(created_at, id) < (?, ?)')
+            params.extend(after)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+        
+        cursor = self.pool.reader().cursor()
+        try:
+            cursor.execute(
+                f'''SELECT id, user_id, username, item_name, item_value, status, created_at FROM withdrawals
+                   {where}
+                   ORDER BY created_at DESC, id DESC LIMIT ?''',
+                params + [limit + 1]
+            )
+            rows = cursor.fetchall()
+            if len(rows) > limit:
+                rows = rows[:limit]
+                return rows, (rows[-1][6], rows[-1][0])
+            return rows, None
+        except Exception as e:
+            logger.error(f"Error getting withdrawals page: {e}")
+            return [], None
+    
+    def set_withdrawals_status(self, withdrawal_ids, status, from_statuses):
+        """Переводит заявки из from_statuses в status одной транзакцией.
+        
+        Возвращает id заявок, которые были изменены, или None при ошибке.
+        """
+        try:
+            id_marks = ', '.join('?' * len(withdrawal_ids))
+            status_marks = ', '.join('?' * len(from_statuses))
+            with self.pool.writer() as conn:
+                updated = [
+                    row[0] for row in conn.execute(
+                        f'SELECT id FROM withdrawals WHERE id IN ({id_marks}) AND status IN ({status_marks})',
+                        list(withdrawal_ids) + list(from_statuses)
+                    )
+                ]
+                if updated:
+                    conn.execute(
+                        f"UPDATE withdrawals SET status = ? WHERE id IN ({', '.join('?' * len(updated))})",
+                        [status] + updated
+                    )
+            return updated
+        except Exception as e:
+            logger.error(f"Error updating withdrawals status: {e}")
+            return None
+    
+    def update_withdrawal_status(self, withdrawal_id, status):
+        try:
+            with self.pool.writer() as conn:
+                conn.execute(
+                    'UPDATE withdrawals SET status = ? WHERE id = ?',
+                    (status, withdrawal_id)
+                )
+            return True
+        except Exception as e:
+            logger.error(f"Error updating withdrawal status: {e}")
+            return False
+    
+    def update_game_stats(self, user_id, won_amount=0):
+        try:
+            with self.pool.writer() as conn:
+                conn.execute(GAME_STATS_UPSERT, (user_id, 1, won_amount, datetime.now().isoformat()))
+            return True
+        except Exception as e:
+            logger.error(f"Error updating game stats: {e}")
+            return False
+    
+    def spin_roulette(self, user_id, cost, item):
+        """Спин целиком в одной транзакции: списание, приз, статистика и журнал.
+        
+        Возвращает (status, new_balance), где status - 'ok', 'not_found',
+        'insufficient' или 'error'. При любой ошибке спин откатывается полностью.
+        """
+        return self.spin_roulette_batch(user_id, cost, [item])
+    
+    def spin_roulette_batch(self, user_id, cost, items):
+        """Несколько спинов одной транзакцией: баланс проверяется и списывается
+        один раз, предметы и журнал вставляются через executemany.
+        
+        cost - стоимость одного спина. Статусы те же, что у spin_roulette.
+        """
+        now = datetime.now().isoformat()
+        total_cost = cost * len(items)
+        total_won = sum(item['value'] for item in items)
+        try:
+            with self.pool.writer() as conn:
+                cursor = conn.cursor()
+                
+                # Проверка баланса и списание одним условным UPDATE
+                cursor.execute(
+                    'UPDATE users SET balance = balance - ? WHERE user_id = ? AND balance >= ?',
+                    (total_cost, user_id, total_cost)
+                )
+                if cursor.rowcount == 0:
+                    cursor.execute('SELECT 1 FROM users WHERE user_id = ?', (user_id,))
+                    return ('insufficient' if cursor.fetchone() else 'not_found'), None
+                
+                # Одинаковые предметы складываются в одну стопку
+                stacks = {}
+                for item in items:
+                    stack = (item['name'], item['value'])
+                    stacks[stack] = stacks.get(stack, 0) + 1
+                cursor.executemany(
+                    INVENTORY_UPSERT,
+                    [(user_id, name, value, count) for (name, value), count in stacks.items()]
+                )
+                
+                cursor.execute(GAME_STATS_UPSERT, (user_id, len(items), total_won, now))
+                
+                ledger = []
+                for item in items:
+                    ledger.append((user_id, "roulette_spin", -cost, "Спин рулетки"))
+                    ledger.append((user_id, "item_won", item['value'], f"Выигрыш: {item['name']}"))
+                cursor.executemany(
+                    'INSERT INTO transactions (user_id, type, amount, description) VALUES (?, ?, ?, ?)',
+                    ledger
+                )
+                
+                row = self.fetch_user_row(conn, user_id)
+            self.user_cache.store(row)
+            self.inventory_cache.invalidate(user_id)
+            return 'ok', row[2]
+        except Exception as e:
+            logger.error(f"Error in spin transaction: {e}")
+            return 'error', None
+    
+    def get_user_stats(self, user_id):
+        cursor = self.pool.reader().cursor()
+        try:
+            cursor.execute(
+                'SELECT spins_count, total_won, last_spin FROM game_stats WHERE user_id = ?',
+                (user_id,)
+            )
+            stats = cursor.fetchone()
+            if stats:
+                return {
+                    'spins_count': stats[0],
+                    'total_won': stats[1],
+                    'last_spin': stats[2]
+                }
+            return {'spins_count': 0, 'total_won': 0, 'last_spin': None}
+        except Exception as e:
+            logger.error(f"Error getting user stats: {e}")
+            return {'spins_count': 0, 'total_won': 0, 'last_spin': None}
+    
+    def get_profile(self, user_id, fields=PROFILE_FIELDS, recent_limit=PROFILE_RECENT_TRANSACTIONS):
+        """Профиль для одного экрана: пользователь, статистика, сводка инвентаря,
+        последние записи журнала и итоги архивных месяцев из одного снимка БД.
+        None, если пользователя нет.
+        """
+        with self.pool.snapshot() as conn:
+            cursor = conn.cursor()
+            cursor.execute(f'SELECT {USER_COLUMNS} FROM users WHERE user_id = ?', (user_id,))
+            row = cursor.fetchone()
+            if not row:
+                return None
+            
+            profile = {}
+            if 'user' in fields:
+                profile['user'] = {
+                    'user_id': row[0],
+                    'username': row[1],
+                    'balance': row[2],
+                    'last_daily_bonus': row[3],
+                    'created_at': row[4]
+                }
+            
+            if 'stats' in fields:
+                cursor.execute(
+                    'SELECT spins_count, total_won, last_spin FROM game_stats WHERE user_id = ?',
+                    (user_id,)
+                )
+                stats = cursor.fetchone() or (0, 0, None)
+                profile['stats'] = {
+                    'spins_count': stats[0],
+                    'total_won': stats[1],
+                    'last_spin': stats[2]
+                }
+            
+            if 'inventory' in fields:
+                cursor.execute(
+                    '''SELECT item_name, item_value, SUM(quantity) FROM inventory
+                       WHERE user_id = ?
+                       GROUP BY item_name, item_value
+                       ORDER BY item_value DESC, item_name''',
+                    (user_id,)
+                )
+                profile['inventory'] = [
+                    {'item_name': r[0], 'item_value': r[1], 'count': r[2]}
+                    for r in cursor.fetchall()
+                ]
+            
+            if 'transactions' in fields:
+                cursor.execute(
+                    '''SELECT id, type, amount, description, created_at FROM transactions
+                       WHERE user_id = ?
+                       ORDER BY created_at DESC, id DESC LIMIT ?''',
+                    (user_id, recent_limit)
+                )
+                profile['transactions'] = [
+                    {'id': r[0], 'type': r[1], 'amount': r[2], 'description': r[3], 'created_at': r[4]}
+                    for r in cursor.fetchall()
+                ]
+            
+            if 'archived' in fields:
+                cursor.execute(
+                    '''SELECT month, type, count, amount FROM ledger_archive_summary
+                       WHERE user_id = ?
+                       ORDER BY month DESC, type''',
+                    (user_id,)
+                )
+                profile['archived'] = [
+                    {'month': r[0], 'type': r[1], 'count': r[2], 'amount': r[3]}
+                    for r in cursor.fetchall()
+                ]
+            
+            return profile
+    
+    def get_ledger_archives(self):
+        cursor = self.pool.reader().cursor()
+        cursor.execute('SELECT month, file, rows, archived_at FROM ledger_archives ORDER BY month')
+        return cursor.fetchall()
+    
+    def get_counters(self, days=()):
+        """Накопительные счётчики (см. миграцию materialized_counters) одним запросом
+        по маленькой таблице; days - дни 'YYYY-MM-DD', для которых нужен dau"""
+        cursor = self.pool.reader().cursor()
+        try:
+            dau_names = [f"dau:{day}" for day in days]
+            placeholders = ', '.join('?' * len(dau_names))
+            cursor.execute(
+                f"SELECT name, value FROM counters WHERE name NOT LIKE 'dau:%' OR name IN ({placeholders})",
+                dau_names
+            )
+            return dict(cursor.fetchall())
+        except Exception as e:
+            logger.error(f"Error getting counters: {e}")
+            return {}
+    
+    def get_counter(self, name):
+        cursor = self.pool.reader().cursor()
+        try:
+            cursor.execute('SELECT value FROM counters WHERE name = ?', (name,))
+            row = cursor.fetchone()
+            return row[0] if row else 0
+        except Exception as e:
+            logger.error(f"Error getting counter {name}: {e}")
+            return 0
+    
+    def get_all_users_count(self):
+        return self.get_counter('users')
+    
+    def get_total_withdrawals_count(self):
+        return self.get_counter('withdrawals')
@@ -0,0 +1,113 @@
+"""Потоковая выгрузка журнала транзакций и заявок на вывод (CSV или JSONL, по желанию gzip).
+
+Строки читаются отдельным соединением пачками через fetchmany и сразу
+отдаются клиенту, поэтому память не зависит от размера таблицы. Записи
+журнала, перенесённые в архивы (archive.py), читаются из файлов архивов
+перед основной БД. Выборка
+идёт по индексам на created_at (для фильтров - (type|status|user_id, created_at))
+в порядке (created_at, id), без сортировки во временной таблице.
+"""
+import io
+import csv
+import json
+import zlib
+import logging
+from archive import open_readonly
+
+logger = logging.getLogger(__name__)
+
+EXPORT_FORMATS = {
+    'csv': 'text/csv; charset=utf-8',
+    'jsonl': 'application/x-ndjson; charset=utf-8',
+}
+
+# Колонки выгрузки и фильтры по равенству (параметр запроса -> колонка)
+EXPORT_TABLES = {
+    'transactions': {
+        'columns': ('id', 'user_id', 'type', 'amount', 'description', 'created_at'),
+        'filters': ('type', 'user_id'),
+    },
+    'withdrawals': {
+        'columns': ('id', 'user_id', 'username', 'item_name', 'item_value', 'status', 'created_at'),
+        'filters': ('status', 'user_id'),
+    },
+}
+
+EXPORT_BATCH = 5000
+EXPORT_GZIP_LEVEL = 6
+
+def export_query(table, since=None, until=None, filters=None):
+    """SQL и параметры выборки; filters - {колонка: значение} из EXPORT_TABLES[table]['filters']"""
+    conditions = []
+    params = []
+    for column, value in (filters or {}).items():
+        conditions.append(f'{column} = ?')
+        params.append(value)
+    if since:
+        conditions.append('created_at >= ?')
+        params.append(since)
+    if until:
+        conditions.append('created_at < ?')
+        params.append(until)
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+    columns = ', '.join(EXPORT_TABLES[table]['columns'])
+    return f'SELECT {columns} FROM {table} {where} ORDER BY created_at, id', params
+
+def encode_rows(columns, fmt, batches):
+    """Пачки строк -> куски текста в формате fmt"""
+    if fmt == 'csv':
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(columns)
+        for rows in batches:
+            writer.writerows(rows)
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+        # Пустая выгрузка - только заголовок
+        if buffer.tell():
+            yield buffer.getvalue()
+    else:
+        for rows in batches:
+            yield ''.join(
+                json.dumps(dict(zip(columns, row)), ensure_ascii=False) + '\n' for row in rows
+            )
+
+def gzip_chunks(chunks, level=EXPORT_GZIP_LEVEL):
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+def stream_export(pool, table, fmt='csv', compress=False, since=None, until=None, filters=None,
+                  archives=(), batch_size=EXPORT_BATCH):
+    """Генератор байтов выгрузки. archives - пути файлов архивов по возрастанию
+    месяца, читаются до основной БД. Соединения открываются по очереди при чтении
+    и закрываются, когда выгрузка дочитана или клиент отключился"""
+    query, params = export_query(table, since, until, filters)
+    columns = EXPORT_TABLES[table]['columns']
+
+    def batches():
+        total = 0
+        for path in list(archives) + [None]:
+            # Свои соединения: генератор может читаться из разных потоков,
+            # а долгая выборка не должна занимать соединение потока
+            conn = open_readonly(path) if path else pool.connect(readonly=True)
+            try:
+                cursor = conn.execute(query, params)
+                while True:
+                    rows = cursor.fetchmany(batch_size)
+                    if not rows:
+                        break
+                    total += len(rows)
+                    yield rows
+            finally:
+                conn.close()
+        logger.info(f"Export of {table} finished: {total} rows")
+
+    chunks = (chunk.encode('utf-8') for chunk in encode_rows(columns, fmt, batches()))
+    if compress:
+        chunks = gzip_chunks(chunks)
+    yield from chunks
@@ -0,0 +1,50 @@
+"""Продакшен-запуск API вместо встроенного сервера Flask:
+
+    cd server && gunicorn -c gunicorn.conf.py
+
+Параметры переопределяются переменными окружения (GUNICORN_BIND,
+WEB_CONCURRENCY, GUNICORN_THREADS). GUNICORN_APP=asgi запускает
+асинхронный вариант API (asgi.py) на воркерах uvicorn.
+"""
+import os
+import importlib
+import multiprocessing
+
+APP_MODULE = os.environ.get('GUNICORN_APP', 'app')
+
+wsgi_app = f'{APP_MODULE}:app'
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:5000')
+
+# Запись в SQLite всё равно идёт по одной транзакции, поэтому воркеров
+# по числу ядер, а параллельные чтения обслуживают потоки внутри воркера
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count()))
+if APP_MODULE == 'asgi':
+    worker_class = 'uvicorn.workers.UvicornWorker'
+else:
+    worker_class = 'gthread'
+    threads = int(os.environ.get('GUNICORN_THREADS', 8))
+
+# Таблицы призов и миграции схемы выполняются один раз в мастере до fork;
+# соединения с SQLite мастер закрывает перед fork (pre_fork), а воркеры
+# открывают свои при первом запросе (см. database.py)
+preload_app = True
+
+timeout = 30
+graceful_timeout = 30
+keepalive = 5
+
+# Перезапуск воркеров ограничивает рост памяти кэшей
+max_requests = 10000
+max_requests_jitter = 1000
+
+accesslog = '-'
+errorlog = '-'
+loglevel = 'info'
+
+def worker_exit(server, worker):
+    # Дописываем отложенный журнал транзакций до выхода воркера
+    importlib.import_module(APP_MODULE).db.close()
+
+def pre_fork(server, worker):
+    # Открытые соединения SQLite не должны переходить в воркер через fork
+    importlib.import_module(APP_MODULE).db.disconnect()
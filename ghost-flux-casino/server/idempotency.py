@@ -0,0 +1,108 @@
+import time
+import logging
+import threading
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+# Сколько хранится ответ по Idempotency-Key
+IDEMPOTENCY_TTL = 24 * 3600
+# Через сколько незавершённая резервация ключа (упавший запрос) считается брошенной
+IDEMPOTENCY_LOCK_TIMEOUT = 60
+IDEMPOTENCY_CACHE_SIZE = 10000
+IDEMPOTENCY_PURGE_EVERY = 1000
+IDEMPOTENCY_MAX_KEY_LENGTH = 255
+
+class IdempotencyStore:
+    """Сохранённые ответы мутирующих запросов по заголовку Idempotency-Key.
+
+    Ключ сначала резервируется строкой без ответа (status NULL) в таблице
+    idempotency_keys, поэтому повтор из другого воркера не выполнит запрос
+    второй раз. Готовые ответы дублируются в LRU в памяти: повтор, пришедший
+    в тот же процесс, обходится без обращения к БД.
+    Записи - кортежи (fingerprint, status, body), body - JSON текстом.
+    complete() вызывается внутри транзакции самого запроса, поэтому ответ
+    фиксируется вместе с изменениями; в память он попадает после коммита (committed).
+    """
+
+    def __init__(self, pool, ttl=IDEMPOTENCY_TTL, cache_size=IDEMPOTENCY_CACHE_SIZE):
+        self.pool = pool
+        self.ttl = ttl
+        self.cache_size = cache_size
+        self.lock = threading.Lock()
+        self.cache = OrderedDict()
+        self.completed = 0
+
+    def cached(self, key):
+        with self.lock:
+            entry = self.cache.get(key)
+            if entry is None:
+                return None
+            record, expires_at = entry
+            if expires_at < time.time():
+                del self.cache[key]
+                return None
+            self.cache.move_to_end(key)
+            return record
+
+    def remember(self, key, record, created_at):
+        with self.lock:
+            self.cache[key] = (record, created_at + self.ttl)
+            self.cache.move_to_end(key)
+            if len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+
+    def reserve(self, key, fingerprint):
+        """None, если ключ зарезервирован этим вызовом, иначе сохранённая запись"""
+        now = time.time()
+        with self.pool.writer() as conn:
+            conn.execute('''
+                DELETE FROM idempotency_keys
+                WHERE key = ? AND (created_at < ? OR (status IS NULL AND created_at < ?))
+            ''', (key, now - self.ttl, now - IDEMPOTENCY_LOCK_TIMEOUT))
+            cursor = conn.execute(
+                'INSERT OR IGNORE INTO idempotency_keys (key, fingerprint, created_at) VALUES (?, ?, ?)',
+                (key, fingerprint, now)
+            )
+            if cursor.rowcount == 1:
+                return None
+            fingerprint, status, body, created_at = conn.execute(
+                'SELECT fingerprint, status, body, created_at FROM idempotency_keys WHERE key = ?',
+                (key,)
+            ).fetchone()
+        record = (fingerprint, status, body)
+        if status is not None:
+            self.remember(key, record, created_at)
+        return record
+
+    def complete(self, key, fingerprint, status, body):
+        """Сохраняет ответ в БД; возвращает (запись, время) для committed()"""
+        now = time.time()
+        with self.pool.writer() as conn:
+            conn.execute(
+                'UPDATE idempotency_keys SET status = ?, body = ?, created_at = ? WHERE key = ?',
+                (status, body, now, key)
+            )
+        return (fingerprint, status, body), now
+
+    def committed(self, key, record, created_at):
+        self.remember(key, record, created_at)
+        self.completed += 1
+        if self.completed % IDEMPOTENCY_PURGE_EVERY == 0:
+            self.purge()
+
+    def release(self, key):
+        """Снимает резервацию, если ответ сохранять не нужно (ошибка сервера, лимит)"""
+        with self.pool.writer() as conn:
+            conn.execute('DELETE FROM idempotency_keys WHERE key = ? AND status IS NULL', (key,))
+
+    def purge(self):
+        try:
+            with self.pool.writer() as conn:
+                cursor = conn.execute(
+                    'DELETE FROM idempotency_keys WHERE created_at < ?', (time.time() - self.ttl,)
+                )
+            if cursor.rowcount:
+                logger.info(f"Purged {cursor.rowcount} expired idempotency keys")
+        except Exception as e:
+            logger.error(f"Error purging idempotency keys: {e}")
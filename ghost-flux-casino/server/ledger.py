@@ -0,0 +1,124 @@
+import queue
+import logging
+import threading
+import time
+from datetime import datetime, timezone
+
+logger = logging.getLogger(__name__)
+
+# Режимы записи журнала транзакций:
+# 'sync' - каждая запись коммитится сразу в запросе пользователя,
+# 'buffered' - записи копятся в очереди и пишутся фоновым потоком пачками
+LEDGER_MODES = ('sync', 'buffered')
+
+LEDGER_QUEUE_SIZE = 10000
+LEDGER_BATCH_SIZE = 500
+LEDGER_FLUSH_INTERVAL = 0.5
+LEDGER_WRITE_ATTEMPTS = 3
+LEDGER_RETRY_DELAY = 0.2
+
+INSERT_TRANSACTION = '''
+    INSERT INTO transactions (user_id, type, amount, description, created_at)
+    VALUES (?, ?, ?, ?, ?)
+'''
+
+def ledger_timestamp():
+    # Тот же формат, что у CURRENT_TIMESTAMP в SQLite, но время берётся
+    # в момент операции, а не в момент записи пачки
+    return datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+
+class LedgerBuffer:
+    """Отложенная запись журнала: ограниченная очередь и фоновый поток,
+    который сбрасывает её в transactions через executemany по размеру
+    пачки или по таймеру.
+    
+    Записи забираются из очереди и пишутся только под self.lock, поэтому
+    flush() дожидается и пачки, которую в этот момент пишет фоновый поток.
+    Пачка, которую не удалось записать (например, database is locked),
+    не теряется: она остаётся в self.failed и пишется первой при следующем сбросе.
+    """
+    
+    def __init__(self, pool, max_size=LEDGER_QUEUE_SIZE, batch_size=LEDGER_BATCH_SIZE,
+                 flush_interval=LEDGER_FLUSH_INTERVAL):
+        self.pool = pool
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.queue = queue.Queue(maxsize=max_size)
+        self.lock = threading.Lock()
+        self.failed = []
+        self.wakeup = threading.Event()
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=self.run, name='ledger-writer', daemon=True)
+        self.thread.start()
+    
+    def add(self, user_id, type_, amount, description=""):
+        row = (user_id, type_, amount, description, ledger_timestamp())
+        if self.pool.owns_writer():
+            # Поток уже в транзакции записи (запрос с Idempotency-Key) - пишем в неё:
+            # запись журнала зафиксируется или откатится вместе с изменением
+            with self.pool.writer() as conn:
+                conn.execute(INSERT_TRANSACTION, row)
+            return
+        try:
+            self.queue.put_nowait(row)
+        except queue.Full:
+            # Очередь переполнена - пишем синхронно, чтобы не терять записи
+            logger.warning("Ledger queue is full, writing synchronously")
+            with self.lock:
+                if not self.write([row]):
+                    self.failed.append(row)
+            return
+        if self.queue.qsize() >= self.batch_size:
+            self.wakeup.set()
+    
+    def run(self):
+        while not self.stop_event.is_set():
+            self.wakeup.wait(self.flush_interval)
+            self.wakeup.clear()
+            self.flush()
+    
+    def take(self, limit):
+        batch = []
+        while len(batch) < limit:
+            try:
+                batch.append(self.queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+    
+    def flush(self):
+        """Синхронно записывает всё, что сейчас лежит в очереди, и отложенные после ошибок пачки.
+        
+        False, если БД недоступна: незаписанное остаётся до следующего сброса.
+        """
+        with self.lock:
+            while True:
+                batch = self.failed or self.take(self.batch_size)
+                if not batch:
+                    return True
+                if not self.write(batch):
+                    self.failed = batch
+                    logger.error(f"{len(batch)} ledger rows kept for the next flush")
+                    return False
+                self.failed = []
+    
+    def write(self, rows):
+        """True, если пачка записана; ошибки повторяются с растущей паузой"""
+        for attempt in range(1, LEDGER_WRITE_ATTEMPTS + 1):
+            try:
+                with self.pool.writer() as conn:
+                    conn.executemany(INSERT_TRANSACTION, rows)
+                return True
+            except Exception as e:
+                logger.warning(f"Error writing {len(rows)} ledger rows (attempt {attempt}): {e}")
+                if attempt < LEDGER_WRITE_ATTEMPTS:
+                    time.sleep(LEDGER_RETRY_DELAY * 2 ** (attempt - 1))
+        return False
+    
+    def close(self):
+        self.stop_event.set()
+        self.wakeup.set()
+        self.thread.join(timeout=self.flush_interval * 4)
+        if not self.flush():
+            # Последний шанс сохранить записи - хотя бы в логе
+            logger.error(f"Ledger rows lost on shutdown: {self.failed + self.take(self.queue.qsize())}")
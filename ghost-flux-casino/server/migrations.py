@@ -0,0 +1,382 @@
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Миграции схемы. Каждая применяется один раз в своей транзакции,
+# номер применённой версии хранится в таблице schema_version.
+# Новые миграции только добавляются в конец списка, старые не меняются.
+
+def initial_schema(cursor):
+    # Пользователи
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS users (
+            user_id INTEGER PRIMARY KEY,
+            username TEXT,
+            balance INTEGER DEFAULT 0,
+            last_daily_bonus DATETIME,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    
+    # Инвентарь
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS inventory (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER,
+            item_name TEXT,
+            item_value INTEGER,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    
+    # Выводы
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS withdrawals (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER,
+            username TEXT,
+            item_name TEXT,
+            item_value INTEGER,
+            status TEXT DEFAULT 'pending',
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    
+    # Транзакции
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS transactions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER,
+            type TEXT,
+            amount INTEGER,
+            description TEXT,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    
+    # Игровые статистики
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS game_stats (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER,
+            spins_count INTEGER DEFAULT 0,
+            total_won INTEGER DEFAULT 0,
+            last_spin DATETIME,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+def hot_table_indexes(cursor):
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_inventory_user_created ON inventory (user_id, created_at)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_transactions_user_created ON transactions (user_id, created_at)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_withdrawals_status_created ON withdrawals (status, created_at)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_withdrawals_user_created ON withdrawals (user_id, created_at)')
+
+def game_stats_by_user(cursor):
+    # Статистика хранится одной строкой на пользователя; дубликаты, которые могли
+    # появиться при гонке SELECT + INSERT, схлопываются в одну запись
+    cursor.execute('''
+        CREATE TABLE game_stats_new (
+            user_id INTEGER PRIMARY KEY,
+            spins_count INTEGER DEFAULT 0,
+            total_won INTEGER DEFAULT 0,
+            last_spin DATETIME,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    cursor.execute('''
+        INSERT INTO game_stats_new (user_id, spins_count, total_won, last_spin, created_at)
+        SELECT user_id, SUM(spins_count), SUM(total_won), MAX(last_spin), MIN(created_at)
+        FROM game_stats
+        WHERE user_id IS NOT NULL
+        GROUP BY user_id
+    ''')
+    cursor.execute('DROP TABLE game_stats')
+    cursor.execute('ALTER TABLE game_stats_new RENAME TO game_stats')
+
+def stackable_inventory(cursor):
+    # Одна строка на (user_id, item_name) с количеством вместо строки на каждый выигрыш;
+    # история отдельных выигрышей остаётся в transactions (item_won)
+    cursor.execute('''
+        CREATE TABLE inventory_new (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            item_name TEXT NOT NULL,
+            item_value INTEGER,
+            quantity INTEGER NOT NULL DEFAULT 0,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            updated_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            UNIQUE (user_id, item_name)
+        )
+    ''')
+    cursor.execute('''
+        INSERT INTO inventory_new (user_id, item_name, item_value, quantity, created_at, updated_at)
+        SELECT user_id, item_name, MAX(item_value), COUNT(*), MIN(created_at), MAX(created_at)
+        FROM inventory
+        WHERE user_id IS NOT NULL AND item_name IS NOT NULL
+        GROUP BY user_id, item_name
+    ''')
+    cursor.execute('DROP TABLE inventory')
+    cursor.execute('ALTER TABLE inventory_new RENAME TO inventory')
+    cursor.execute('CREATE INDEX idx_inventory_user_updated ON inventory (user_id, updated_at)')
+
+def rate_limits(cursor):
+    # Бакеты лимитов запросов, общие для всех процессов (ratelimit.py, бэкенд 'sqlite')
+    cursor.execute('''
+        CREATE TABLE rate_limits (
+            key TEXT PRIMARY KEY,
+            tokens REAL NOT NULL,
+            updated_at REAL NOT NULL
+        ) WITHOUT ROWID
+    ''')
+
+def idempotency_keys(cursor):
+    # Ответы мутирующих запросов по Idempotency-Key (idempotency.py);
+    # status NULL - запрос с этим ключом ещё выполняется
+    cursor.execute('''
+        CREATE TABLE idempotency_keys (
+            key TEXT PRIMARY KEY,
+            fingerprint TEXT NOT NULL,
+            status INTEGER,
+            body TEXT,
+            created_at REAL NOT NULL
+        ) WITHOUT ROWID
+    ''')
+    cursor.execute('CREATE INDEX idx_idempotency_keys_created ON idempotency_keys (created_at)')
+
+def materialized_counters(cursor):
+    # Счётчики для /api/admin/stats, которые ведут триггеры: статистика
+    # читается по ключу, а не COUNT(*) по таблицам. Счётчики накопительные -
+    # удаление старых записей журнала их не уменьшает.
+    #   users, withdrawals, withdrawals:<status>
+    #   tx_count:<type>, tx_amount:<type> - записи журнала по типам
+    #   dau:<YYYY-MM-DD> - уникальные пользователи с записями в журнале за день (UTC)
+    cursor.execute('''
+        CREATE TABLE counters (
+            name TEXT PRIMARY KEY,
+            value INTEGER NOT NULL DEFAULT 0
+        ) WITHOUT ROWID
+    ''')
+    # Кто уже учтён в dau; хранятся только последние два дня
+    cursor.execute('''
+        CREATE TABLE daily_active (
+            day TEXT NOT NULL,
+            user_id INTEGER NOT NULL,
+            PRIMARY KEY (day, user_id)
+        ) WITHOUT ROWID
+    ''')
+    
+    # Начальные значения по уже накопленным данным - до создания триггеров
+    cursor.execute("INSERT INTO counters (name, value) SELECT 'users', COUNT(*) FROM users")
+    cursor.execute("INSERT INTO counters (name, value) SELECT 'withdrawals', COUNT(*) FROM withdrawals")
+    cursor.execute('''
+        INSERT INTO counters (name, value)
+        SELECT 'withdrawals:' || IFNULL(status, 'unknown'), COUNT(*) FROM withdrawals GROUP BY status
+    ''')
+    cursor.execute('''
+        INSERT INTO counters (name, value)
+        SELECT 'tx_count:' || IFNULL(type, 'unknown'), COUNT(*) FROM transactions GROUP BY type
+        UNION ALL
+        SELECT 'tx_amount:' || IFNULL(type, 'unknown'), IFNULL(SUM(amount), 0) FROM transactions GROUP BY type
+    ''')
+    cursor.execute('''
+        INSERT INTO counters (name, value)
+        SELECT 'dau:' || date(created_at), COUNT(DISTINCT user_id) FROM transactions
+        WHERE date(created_at) IS NOT NULL GROUP BY date(created_at)
+    ''')
+    cursor.execute('''
+        INSERT OR IGNORE INTO daily_active (day, user_id)
+        SELECT DISTINCT date(created_at), user_id FROM transactions
+        WHERE date(created_at) >= date('now', '-1 day') AND user_id IS NOT NULL
+    ''')
+    
+    cursor.execute('''
+        CREATE TRIGGER counters_users_insert AFTER INSERT ON users BEGIN
+            INSERT INTO counters (name, value) VALUES ('users', 1)
+            ON CONFLICT(name) DO UPDATE SET value = value + 1;
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER counters_users_delete AFTER DELETE ON users BEGIN
+            UPDATE counters SET value = value - 1 WHERE name = 'users';
+        END
+    ''')
+    
+    cursor.execute('''
+        CREATE TRIGGER counters_withdrawals_insert AFTER INSERT ON withdrawals BEGIN
+            INSERT INTO counters (name, value) VALUES ('withdrawals', 1), ('withdrawals:' || IFNULL(NEW.status, 'unknown'), 1)
+            ON CONFLICT(name) DO UPDATE SET value = value + 1;
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER counters_withdrawals_status AFTER UPDATE OF status ON withdrawals
+        WHEN OLD.status IS NOT NEW.status BEGIN
+            UPDATE counters SET value = value - 1 WHERE name = 'withdrawals:' || IFNULL(OLD.status, 'unknown');
+            INSERT INTO counters (name, value) VALUES ('withdrawals:' || IFNULL(NEW.status, 'unknown'), 1)
+            ON CONFLICT(name) DO UPDATE SET value = value + 1;
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER counters_withdrawals_delete AFTER DELETE ON withdrawals BEGIN
+            UPDATE counters SET value = value - 1 WHERE name IN ('withdrawals', 'withdrawals:' || IFNULL(OLD.status, 'unknown'));
+        END
+    ''')
+    
+    cursor.execute('''
+        CREATE TRIGGER counters_transactions_insert AFTER INSERT ON transactions BEGIN
+            INSERT INTO counters (name, value)
+            VALUES ('tx_count:' || IFNULL(NEW.type, 'unknown'), 1), ('tx_amount:' || IFNULL(NEW.type, 'unknown'), IFNULL(NEW.amount, 0))
+            ON CONFLICT(name) DO UPDATE SET value = value + excluded.value;
+            INSERT OR IGNORE INTO daily_active (day, user_id)
+            SELECT date(NEW.created_at), NEW.user_id WHERE NEW.user_id IS NOT NULL AND date(NEW.created_at) IS NOT NULL;
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER counters_daily_active_insert AFTER INSERT ON daily_active BEGIN
+            INSERT INTO counters (name, value) VALUES ('dau:' || NEW.day, 1)
+            ON CONFLICT(name) DO UPDATE SET value = value + 1;
+            DELETE FROM daily_active WHERE day < date(NEW.day, '-1 day');
+        END
+    ''')
+
+def ledger_rollups(cursor):
+    # Агрегаты журнала по часам и дням (rollups.py) и отметка обработанных записей
+    cursor.execute('''
+        CREATE TABLE ledger_rollups (
+            bucket TEXT NOT NULL,
+            period TEXT NOT NULL,
+            type TEXT NOT NULL,
+            count INTEGER NOT NULL,
+            amount INTEGER NOT NULL,
+            PRIMARY KEY (bucket, period, type)
+        ) WITHOUT ROWID
+    ''')
+    cursor.execute('''
+        CREATE TABLE rollup_state (
+            name TEXT PRIMARY KEY,
+            last_id INTEGER NOT NULL,
+            updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    cursor.execute("INSERT INTO rollup_state (name, last_id) VALUES ('transactions', 0)")
+
+def withdrawals_created_index(cursor):
+    # Очередь выводов без фильтра по статусу листается по (created_at, id)
+    cursor.execute('CREATE INDEX idx_withdrawals_created ON withdrawals (created_at)')
+
+def daily_bonus_epoch(cursor):
+    # last_daily_bonus - целые секунды Unix вместо ISO-строки локального времени
+    # (модификатор 'utc' переводит локальное время в UTC). Индекс нужен выборке
+    # пользователей, которым доступен бонус (Database.get_bonus_claimable)
+    cursor.execute('''
+        UPDATE users SET last_daily_bonus = CAST(strftime('%s', last_daily_bonus, 'utc') AS INTEGER)
+        WHERE typeof(last_daily_bonus) = 'text'
+    ''')
+    cursor.execute('CREATE INDEX idx_users_last_daily_bonus ON users (last_daily_bonus)')
+
+def export_indexes(cursor):
+    # Выгрузка журнала (export.py) по датам и по типу в порядке (created_at, id)
+    cursor.execute('CREATE INDEX idx_transactions_created ON transactions (created_at)')
+    cursor.execute('CREATE INDEX idx_transactions_type_created ON transactions (type, created_at)')
+
+def ledger_archives(cursor):
+    # Архивы журнала по месяцам (archive.py) и итоги перенесённых записей,
+    # оставшиеся в основной БД вместо них
+    cursor.execute('''
+        CREATE TABLE ledger_archives (
+            month TEXT PRIMARY KEY,
+            file TEXT NOT NULL,
+            rows INTEGER NOT NULL DEFAULT 0,
+            archived_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    cursor.execute('''
+        CREATE TABLE ledger_archive_summary (
+            month TEXT NOT NULL,
+            user_id INTEGER NOT NULL,
+            type TEXT NOT NULL,
+            count INTEGER NOT NULL,
+            amount INTEGER NOT NULL,
+            PRIMARY KEY (month, user_id, type)
+        ) WITHOUT ROWID
+    ''')
+    cursor.execute('CREATE INDEX idx_ledger_archive_summary_user ON ledger_archive_summary (user_id)')
+
+def inventory_stacks_by_value(cursor):
+    # Стопка - (user_id, item_name, item_value): изменение ценности приза в prizes.json
+    # не переоценивает уже выигранные предметы, новые ложатся в отдельную стопку.
+    # id стопок сохраняются (их передаёт /api/withdraw), как и счётчик AUTOINCREMENT
+    cursor.execute('''
+        CREATE TABLE inventory_new (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            item_name TEXT NOT NULL,
+            item_value INTEGER NOT NULL DEFAULT 0,
+            quantity INTEGER NOT NULL DEFAULT 0,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            updated_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            UNIQUE (user_id, item_name, item_value)
+        )
+    ''')
+    cursor.execute('''
+        INSERT INTO inventory_new (id, user_id, item_name, item_value, quantity, created_at, updated_at)
+        SELECT id, user_id, item_name, IFNULL(item_value, 0), quantity, created_at, updated_at
+        FROM inventory
+    ''')
+    cursor.execute('''
+        UPDATE sqlite_sequence SET seq = MAX(seq, IFNULL((SELECT seq FROM sqlite_sequence WHERE name = 'inventory'), 0))
+        WHERE name = 'inventory_new'
+    ''')
+    cursor.execute('DROP TABLE inventory')
+    cursor.execute('ALTER TABLE inventory_new RENAME TO inventory')
+    cursor.execute('CREATE INDEX idx_inventory_user_updated ON inventory (user_id, updated_at)')
+
+def inventory_created_index(cursor):
+    # Страницы /api/inventory листаются по неизменному ключу (created_at, id)
+    cursor.execute('CREATE INDEX idx_inventory_user_created ON inventory (user_id, created_at)')
+
+MIGRATIONS = [
+    (1, "initial schema", initial_schema),
+    (2, "indexes for hot tables", hot_table_indexes),
+    (3, "game_stats keyed by user_id", game_stats_by_user),
+    (4, "stackable inventory", stackable_inventory),
+    (5, "rate limit buckets", rate_limits),
+    (6, "idempotency keys", idempotency_keys),
+    (7, "materialized counters", materialized_counters),
+    (8, "ledger rollups", ledger_rollups),
+    (9, "withdrawals created_at index", withdrawals_created_index),
+    (10, "daily bonus epoch seconds", daily_bonus_epoch),
+    (11, "transactions export indexes", export_indexes),
+    (12, "ledger archives", ledger_archives),
+    (13, "inventory stacks keyed by value", inventory_stacks_by_value),
+    (14, "inventory created_at index", inventory_created_index),
+]
+
+def get_schema_version(cursor):
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            name TEXT,
+            applied_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    cursor.execute('SELECT MAX(version) FROM schema_version')
+    return cursor.fetchone()[0] or 0
+
+def migrate(pool):
+    """Применяет недостающие миграции. Безопасно при одновременном запуске
+    нескольких процессов: версия перепроверяется внутри BEGIN IMMEDIATE"""
+    for version, name, apply in MIGRATIONS:
+        with pool.writer() as conn:
+            cursor = conn.cursor()
+            if get_schema_version(cursor) >= version:
+                continue
+            apply(cursor)
+            cursor.execute(
+                'INSERT INTO schema_version (version, name) VALUES (?, ?)',
+                (version, name)
+            )
+            logger.info(f"Applied migration {version}: {name}")
+    
+    with pool.writer() as conn:
+        return get_schema_version(conn.cursor())
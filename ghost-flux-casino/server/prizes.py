@@ -0,0 +1,237 @@
+import os
+import json
+import time
+import random
+import hashlib
+import logging
+import threading
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+logger = logging.getLogger(__name__)
+
+# Конфигурация игры
+ROULETTE_ITEMS = [
+    {"name": "Мишка", "value": 15, "chance": 35, "emoji": "🧸"},
+    {"name": "Сердечко", "value": 15, "chance": 35, "emoji": "💖"},
+    {"name": "Ракета", "value": 50, "chance": 10, "emoji": "🚀"},
+    {"name": "Торт", "value": 50, "chance": 10, "emoji": "🎂"},
+    {"name": "Кубок", "value": 100, "chance": 5, "emoji": "🏆"},
+    {"name": "Кольцо", "value": 100, "chance": 5, "emoji": "💍"}
+]
+
+SPIN_COST = 25
+
+# Максимум спинов в одном запросе /api/spin-roulette/batch
+MAX_BATCH_SPINS = 100
+
+DAILY_BONUS = [
+    {"stars": 5, "chance": 70},
+    {"stars": 10, "chance": 15},
+    {"stars": 25, "chance": 10},
+    {"stars": 50, "chance": 5}
+]
+
+# Таблицы можно поменять без перезапуска: prizes.json рядом с этим файлом,
+# {"roulette": [...], "daily_bonus": [...]} в формате списков выше.
+# Каждый процесс проверяет время изменения файла не чаще раза в PRIZES_CHECK_INTERVAL секунд
+PRIZES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'prizes.json')
+PRIZES_CHECK_INTERVAL = 5
+
+class HashDRBG(random.Random):
+    """Детерминированный криптостойкий генератор: блоки SHA-256 от (ключ, счётчик).
+    
+    При одинаковом seed выдаёт одинаковую последовательность, поэтому
+    розыгрыши можно воспроизвести при аудите. Без seed ключ берётся из os.urandom.
+    """
+    
+    def __init__(self, seed=None):
+        self.lock = threading.Lock()
+        super().__init__(seed)
+    
+    def seed(self, a=None, version=2):
+        if a is None:
+            a = os.urandom(32)
+        elif isinstance(a, int):
+            a = a.to_bytes((a.bit_length() + 8) // 8, 'big', signed=True)
+        elif isinstance(a, str):
+            a = a.encode()
+        self.key = hashlib.sha256(bytes(a)).digest()
+        self.counter = 0
+    
+    def getstate(self):
+        return self.key, self.counter
+    
+    def setstate(self, state):
+        self.key, self.counter = state
+    
+    def getrandbits(self, k):
+        if k < 0:
+            raise ValueError("number of bits must be non-negative")
+        blocks = (k + 255) // 256
+        with self.lock:
+            counter = self.counter
+            self.counter += blocks
+        data = b''.join(
+            hashlib.sha256(self.key + (counter + i).to_bytes(8, 'big')).digest()
+            for i in range(blocks)
+        )
+        return int.from_bytes(data, 'big') >> (blocks * 256 - k)
+    
+    def random(self):
+        return self.getrandbits(53) / (1 << 53)
+
+class AliasSampler:
+    """Выбор по весам за O(1) методом алиасов (Walker/Vose).
+    
+    Таблица строится один раз в целых числах, поэтому вероятности
+    совпадают с весами точно, без ошибок округления.
+    """
+    
+    def __init__(self, weights):
+        if not weights or any(not isinstance(w, int) or w < 0 for w in weights) or sum(weights) <= 0:
+            raise ValueError("weights must be non-negative integers with a positive sum")
+        
+        n = len(weights)
+        total = sum(weights)
+        # Порог для столбца i: остаёмся в i, если r < prob[i], где r в [0, total)
+        scaled = [w * n for w in weights]
+        prob = [0] * n
+        alias = list(range(n))
+        small = [i for i, s in enumerate(scaled) if s < total]
+        large = [i for i, s in enumerate(scaled) if s >= total]
+        
+        while small and large:
+            s = small.pop()
+            l = large.pop()
+            prob[s] = scaled[s]
+            alias[s] = l
+            scaled[l] -= total - scaled[s]
+            if scaled[l] < total:
+                small.append(l)
+            else:
+                large.append(l)
+        for i in large + small:
+            prob[i] = total
+        
+        self.n = n
+        self.total = total
+        self.prob = prob
+        self.alias = alias
+    
+    def draw(self, rng):
+        # Одно случайное число даёт и столбец, и «монетку» внутри него
+        i, coin = divmod(rng.randrange(self.n * self.total), self.total)
+        if coin < self.prob[i]:
+            return i
+        return self.alias[i]
+    
+    def sample(self, size, rng):
+        """size индексов; при наличии numpy - одним векторным проходом (numpy.ndarray)"""
+        if np is None:
+            return [self.draw(rng) for _ in range(size)]
+        if not isinstance(rng, np.random.Generator):
+            rng = np.random.default_rng(rng.getrandbits(128))
+        cols = rng.integers(0, self.n, size=size)
+        coins = rng.integers(0, self.total, size=size)
+        prob = np.asarray(self.prob)
+        alias = np.asarray(self.alias)
+        return np.where(coins < prob[cols], cols, alias[cols])
+
+class PrizeTable:
+    """Таблица призов, скомпилированная в AliasSampler.
+    
+    reload() подменяет таблицу целиком на лету: запросы, которые уже
+    начали розыгрыш, дорабатывают со старой таблицей. С config_key таблица
+    перечитывается из раздела config_key файла PRIZES_PATH, когда файл меняется;
+    таблица с ошибкой (нет полей исходных призов, веса не целые) не применяется.
+    Собственный генератор переинициализируется после fork, иначе все
+    воркеры gunicorn выдавали бы одну и ту же последовательность призов.
+    """
+    
+    def __init__(self, items, weight_key='chance', rng=None, config_key=None, config_path=PRIZES_PATH):
+        self.weight_key = weight_key
+        self.rng = rng or random.Random()
+        self.own_rng = rng is None
+        self.fields = set(items[0])
+        self.config_key = config_key
+        self.config_path = config_path
+        self.config_mtime = None
+        self.next_check = 0.0
+        self.compiled = None
+        self.reload(items)
+        self.check_config()
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self.after_fork)
+    
+    def reload(self, items):
+        items = [dict(item) for item in items]
+        for item in items:
+            missing = self.fields - set(item)
+            if missing:
+                raise ValueError(f"prize {item} has no {', '.join(sorted(missing))}")
+        sampler = AliasSampler([item[self.weight_key] for item in items])
+        self.compiled = (items, sampler)
+    
+    def check_config(self):
+        """Перечитывает таблицу из файла, если он изменился с прошлой проверки"""
+        if self.config_key is None:
+            return
+        now = time.monotonic()
+        if now < self.next_check:
+            return
+        self.next_check = now + PRIZES_CHECK_INTERVAL
+        
+        try:
+            mtime = os.stat(self.config_path).st_mtime_ns
+        except FileNotFoundError:
+            return
+        except OSError as e:
+            logger.error(f"Could not check prize config {self.config_path}: {e}")
+            return
+        if mtime == self.config_mtime:
+            return
+        self.config_mtime = mtime
+        
+        try:
+            with open(self.config_path, encoding='utf-8') as f:
+                items = json.load(f)[self.config_key]
+            self.reload(items)
+        except (OSError, ValueError, KeyError, TypeError, IndexError) as e:
+            logger.error(f"Prize table '{self.config_key}' not reloaded, keeping the current one: {e}")
+            return
+        logger.info(f"Prize table '{self.config_key}' reloaded from {self.config_path}: {len(items)} prizes")
+    
+    def set_rng(self, rng):
+        """Подмена источника случайности, например HashDRBG(seed) для аудита"""
+        self.rng = rng
+        self.own_rng = False
+    
+    def after_fork(self):
+        if self.own_rng:
+            self.rng.seed()
+    
+    @property
+    def items(self):
+        return self.compiled[0]
+    
+    def draw(self):
+        self.check_config()
+        items, sampler = self.compiled
+        return items[sampler.draw(self.rng)]
+    
+    def draw_many(self, count):
+        """count розыгрышей по одной и той же версии таблицы"""
+        self.check_config()
+        items, sampler = self.compiled
+        return [items[sampler.draw(self.rng)] for _ in range(count)]
+    
+    def sample(self, size, rng=None):
+        """Индексы size розыгрышей в self.items - для массовых симуляций"""
+        return self.compiled[1].sample(size, rng or self.rng)
+
+roulette_table = PrizeTable(ROULETTE_ITEMS, config_key='roulette')
+daily_bonus_table = PrizeTable(DAILY_BONUS, config_key='daily_bonus')
@@ -0,0 +1,132 @@
+import time
+import logging
+import threading
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+# Лимиты по user_id: (ёмкость бакета, пополнение токенов в секунду).
+# Спины: серия до 10 подряд, дальше 2 в секунду; batch считается одним запросом
+RATE_LIMITS = {
+    'spin': (10, 2.0),
+    'daily_bonus': (3, 0.05),
+}
+
+# 'memory' - бакеты в памяти процесса, 'sqlite' - в таблице rate_limits,
+# общие для всех воркеров (каждая проверка - короткая транзакция записи)
+RATE_LIMIT_BACKEND = 'memory'
+RATE_LIMIT_BACKENDS = ('memory', 'sqlite')
+
+RATE_LIMIT_KEYS = 100000
+
+def refill(tokens, updated_at, now, capacity, rate, cost):
+    """Пополняет бакет на момент now и пытается списать cost токенов"""
+    tokens = min(capacity, tokens + max(0.0, now - updated_at) * rate)
+    allowed = tokens >= cost
+    if allowed:
+        tokens -= cost
+    return allowed, tokens
+
+class MemoryBucketStore:
+    def __init__(self, max_keys=RATE_LIMIT_KEYS):
+        self.max_keys = max_keys
+        self.lock = threading.Lock()
+        self.buckets = OrderedDict()
+
+    def take(self, key, capacity, rate, cost):
+        now = time.monotonic()
+        with self.lock:
+            tokens, updated_at = self.buckets.get(key, (capacity, now))
+            allowed, tokens = refill(tokens, updated_at, now, capacity, rate, cost)
+            self.buckets[key] = (tokens, now)
+            self.buckets.move_to_end(key)
+            if len(self.buckets) > self.max_keys:
+                self.buckets.popitem(last=False)
+            return allowed, tokens
+
+class SQLiteBucketStore:
+    def __init__(self, pool):
+        self.pool = pool
+
+    def take(self, key, capacity, rate, cost):
+        # Время стены, а не monotonic: бакеты общие для разных процессов
+        now = time.time()
+        with self.pool.writer() as conn:
+            row = conn.execute(
+                'SELECT tokens, updated_at FROM rate_limits WHERE key = ?', (key,)
+            ).fetchone()
+            tokens, updated_at = row if row else (capacity, now)
+            allowed, tokens = refill(tokens, updated_at, now, capacity, rate, cost)
+            conn.execute('''
+                INSERT INTO rate_limits (key, tokens, updated_at) VALUES (?, ?, ?)
+                ON CONFLICT(key) DO UPDATE SET tokens = excluded.tokens, updated_at = excluded.updated_at
+            ''', (key, tokens, now))
+        return allowed, tokens
+
+class RateLimiter:
+    """Token bucket на пользователя для каждого вида запросов (RATE_LIMITS)"""
+
+    def __init__(self, store, limits=RATE_LIMITS):
+        self.store = store
+        self.limits = limits
+
+    def check(self, scope, user_id, cost=1):
+        """(разрешено, через сколько секунд можно повторить)"""
+        capacity, rate = self.limits[scope]
+        try:
+            allowed, tokens = self.store.take(f"{scope}:{user_id}", capacity, rate, cost)
+        except Exception as e:
+            # Сбой хранилища лимитов не должен останавливать игру
+            logger.error(f"Rate limit check failed: {e}")
+            return True, 0
+        if allowed:
+            return True, 0
+        return False, round((cost - tokens) / rate, 1)
+
+def create_limiter(db, backend=RATE_LIMIT_BACKEND):
+    if backend not in RATE_LIMIT_BACKENDS:
+        raise ValueError(f"Unknown rate limit backend: {backend}")
+    if backend == 'sqlite':
+        return RateLimiter(SQLiteBucketStore(db.pool))
+    return RateLimiter(MemoryBucketStore())
+
+class Flight:
+    __slots__ = ('done', 'result', 'error')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+class SingleFlight:
+    """Одновременные вызовы с одним ключом выполняются один раз:
+    первый выполняет функцию, остальные ждут и получают тот же результат"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.flights = {}
+
+    def do(self, key, func):
+        with self.lock:
+            flight = self.flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = Flight()
+                self.flights[key] = flight
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+
+        try:
+            flight.result = func()
+            return flight.result
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self.lock:
+                del self.flights[key]
+            flight.done.set()
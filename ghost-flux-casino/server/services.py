@@ -0,0 +1,844 @@
+import re
+import json
+import time
+import base64
+import asyncio
+import hashlib
+import inspect
+import logging
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from urllib.parse import urlsplit, parse_qsl
+from database import PROFILE_FIELDS
+from ratelimit import create_limiter, SingleFlight
+from idempotency import IdempotencyStore, IDEMPOTENCY_MAX_KEY_LENGTH
+from rollups import ROLLUP_BUCKETS, default_since
+from export import EXPORT_FORMATS, EXPORT_TABLES, stream_export
+from prizes import SPIN_COST, MAX_BATCH_SPINS, roulette_table, daily_bonus_table
+
+logger = logging.getLogger(__name__)
+
+# Размер страницы /api/inventory по умолчанию и максимальный
+INVENTORY_PAGE_SIZE = 100
+INVENTORY_MAX_PAGE_SIZE = 500
+
+# Секунд между ежедневными бонусами; время бонуса хранится в секундах Unix
+DAILY_BONUS_COOLDOWN = 24 * 3600
+# Страница выборки получателей рассылок: все пользователи или те, кому доступен бонус
+RECIPIENTS_PAGE_SIZE = 1000
+RECIPIENTS_MAX_PAGE_SIZE = 10000
+
+# Очередь заявок на вывод: статусы, пакетные действия (из каких статусов -> в какой)
+WITHDRAWAL_STATUSES = ('pending', 'approved', 'completed')
+WITHDRAWAL_ACTIONS = {
+    'approve': (('pending',), 'approved'),
+    'complete': (('pending', 'approved'), 'completed'),
+}
+WITHDRAWALS_PAGE_SIZE = 20
+WITHDRAWALS_MAX_PAGE_SIZE = 100
+MAX_WITHDRAWAL_BATCH = 100
+
+# Потоки для SQLite в асинхронном API
+ASYNC_DB_WORKERS = 16
+
+def dump_json(body):
+    # Тот же вывод, что у flask.jsonify: сортировка ключей, без пробелов, перевод строки в конце
+    return (json.dumps(body, ensure_ascii=True, sort_keys=True, separators=(',', ':')) + '\n').encode()
+
+def encode_cursor(key):
+    return base64.urlsafe_b64encode(json.dumps(key).encode()).decode().rstrip('=')
+
+def decode_cursor(cursor):
+    padded = cursor + '=' * (-len(cursor) % 4)
+    created_at, row_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    return created_at, int(row_id)
+
+class CasinoService:
+    """Бизнес-логика API без привязки к Flask.
+    
+    Каждый метод возвращает (тело ответа, HTTP статус). Используется
+    view-функциями в app.py и ботом во встроенном режиме (без HTTP).
+    """
+    
+    def __init__(self, db, limiter=None):
+        self.db = db
+        self.limiter = limiter or create_limiter(db)
+        self.flights = SingleFlight()
+        self.idempotency = IdempotencyStore(db.pool)
+    
+    def idempotent(self, name, key, data, handler):
+        """Выполняет handler() один раз на Idempotency-Key; повтор с тем же ключом
+        получает сохранённый ответ, не выполняя запрос. Ответы 5xx и 429
+        не сохраняются - такой запрос можно повторить с тем же ключом"""
+        if not key:
+            return handler()
+        if len(key) > IDEMPOTENCY_MAX_KEY_LENGTH:
+            return {"error": "Idempotency-Key is too long"}, 400
+        
+        key = f"{name}:{key}"
+        fingerprint = hashlib.sha256(json.dumps(data, sort_keys=True, default=str).encode()).hexdigest()
+        
+        def run():
+            record = self.idempotency.cached(key) or self.idempotency.reserve(key, fingerprint)
+            if record is None:
+                # Изменения запроса и сохранённый ответ - одна транзакция: если ответ
+                # не записался, откатывается и сам запрос, и повтор выполнит его заново
+                stored = None
+                try:
+                    with self.db.pool.writer():
+                        body, status = handler()
+                        if status >= 500 or status == 429:
+                            self.idempotency.release(key)
+                        else:
+                            stored = self.idempotency.complete(key, fingerprint, status, dump_json(body).decode())
+                except BaseException:
+                    # Кэши могли обновиться внутри откаченной транзакции
+                    if isinstance(data, dict):
+                        self.db.invalidate_user(data.get('user_id'))
+                    self.idempotency.release(key)
+                    raise
+                if stored is not None:
+                    self.idempotency.committed(key, *stored)
+                return body, status
+            
+            stored_fingerprint, status, body = record
+            if stored_fingerprint != fingerprint:
+                return {"error": "Idempotency-Key was used with a different request"}, 422
+            if status is None:
+                return {"error": "Request with this Idempotency-Key is in progress"}, 409
+            return json.loads(body), status
+        
+        try:
+            return self.flights.do(('idempotency', key), run)
+        except Exception as e:
+            logger.error(f"Error in idempotent {name}: {e}")
+            return {"error": "Internal server error"}, 500
+    
+    def single_flight(self, name, scope, data, handler, idempotency_key=None):
+        """Одинаковые одновременные запросы пользователя выполняются один раз,
+        остальные получают тот же ответ; лимит scope списывается за выполнение.
+        Запросы с разными Idempotency-Key - разные операции клиента и не объединяются"""
+        user_id = data.get('user_id') if isinstance(data, dict) else None
+        if not user_id:
+            return handler(data)
+        
+        def run():
+            allowed, retry_after = self.limiter.check(scope, user_id)
+            if not allowed:
+                logger.warning(f"Rate limited: User {user_id} - {name}")
+                return {"error": "Too many requests", "retry_after": retry_after}, 429
+            return handler(data)
+        
+        key = (name, idempotency_key, json.dumps(data, sort_keys=True, default=str))
+        return self.flights.do(key, run)
+    
+    def get_user(self, user_id):
+        try:
+            user = self.db.get_user(user_id)
+            if not user:
+                return {"error": "User not found"}, 404
+            
+            # Получаем статистику игрока
+            stats = self.db.get_user_stats(user_id)
+            user['stats'] = stats
+            
+            return user, 200
+        except Exception as e:
+            logger.error(f"Error in get_user: {e}")
+            return {"error": "Internal server error"}, 500
+    
+    def get_profile(self, user_id, fields=None):
+        """Всё для экрана профиля одним запросом; fields="user,stats" выбирает разделы"""
+        try:
+            if fields:
+                fields = tuple(f.strip() for f in fields.split(',') if f.strip())
+                unknown = set(fields) - set(PROFILE_FIELDS)
+                if unknown:
+                    return {"error": f"Unknown fields: {', '.join(sorted(unknown))}"}, 400
+            else:
+                fields = PROFILE_FIELDS
+            
+            profile = self.db.get_profile(user_id, fields)
+            if profile is None:
+                return {"error": "User not found"}, 404
+            
+            return profile, 200
+        except Exception as e:
+            logger.error(f"Error in get_profile: {e}")
+            return {"error": "Internal server error"}, 500
+    
+    def register_user(self, data):
+        try:
+            if not data:
+                return {"error": "No data provided"}, 400
+            
+            user_id = data.get('user_id')
+            username = data.get('username', 'Unknown')
+            
+            if not user_id:
+                return {"error": "User ID is required"}, 400
+            
+            success = self.db.create_user(user_id, username)
+            if success:
+                return {"status": "success", "message": "User registered"}, 200
+            else:
+                return {"error": "Failed to register user"}, 500
+        
+        except Exception as e:
+            logger.error(f"Error in register_user: {e}")
+            return {"error": "Internal server error"}, 500
+    
+    def daily_bonus(self, data):
+        return self.single_flight('daily-bonus', 'daily_bonus', data, self.claim_daily_bonus)
+    
+    def claim_daily_bonus(self, data):
+        try:
+            if not data:
+                return {"error": "No data provided"}, 400
+            
+            user_id = data.get('user_id')
+            if not user_id:
+                return {"error": "User ID is required"}, 400
+            
+            user = self.db.get_user(user_id)
+            if not user:
+                return {"error": "User not found"}, 404
+            
+            now = int(time.time())
+            
+            # Быстрая проверка по кэшу; окончательная - в транзакции начисления
+            too_early = self.bonus_cooldown_error(user.get('last_daily_bonus'), now)
+            if too_early:
+                return too_early
+            
+            # Выдаем бонус
+            bonus = daily_bonus_table.draw()['stars']
+            
+            # Баланс и время получения бонуса - одной транзакцией с проверкой
+            status, result = self.db.claim_daily_bonus(user_id, bonus, now, DAILY_BONUS_COOLDOWN)
+            if status == 'not_found':
+                return {"error": "User not found"}, 404
+            if status == 'too_early':
+                return self.bonus_cooldown_error(result, now)
+            if status != 'ok':
+                return {"error": "Failed to update balance"}, 500
+            
+            # Добавляем транзакцию
+            self.db.add_transaction(user_id, "daily_bonus", bonus, "Ежедневный бонус")
+            
+            logger.info(f"Daily bonus given: User {user_id} - {bonus} stars")
+            
+            return {
+                "bonus": bonus,
+                "new_balance": result,
+                "message": f"🎁 Вы получили {bonus} звёзд!"
+            }, 200
+        
+        except Exception as e:
+            logger.error(f"Error in daily_bonus: {e}")
+            return {"error": "Internal server error"}, 500
+    
+    def bonus_cooldown_error(self, last_bonus, now):
+        """Ответ 400, если бонус ещё недоступен, иначе None (время - секунды Unix)"""
+        if last_bonus is None or now - last_bonus >= DAILY_BONUS_COOLDOWN:
+            return None
+        time_left = DAILY_BONUS_COOLDOWN - (now - last_bonus)
+        hours_left = time_left // 3600
+        minutes_left = (time_left % 3600) // 60
+        return {
+            "error": f"Bonus already claimed. Next available in {hours_left}h {minutes_left}m"
+        }, 400
+    
+    def get_bonus_claimable(self, limit=RECIPIENTS_PAGE_SIZE, cursor=None):
+        """user_id тех, кому сейчас доступен ежедневный бонус, постранично"""
+        try:
+            try:
+                limit = int(limit)
+            except (ValueError, TypeError):
+                return {"error": "Limit must be an integer"}, 400
+            if not 1 <= limit <= RECIPIENTS_MAX_PAGE_SIZE:
+                return {"error": f"Limit must be from 1 to {RECIPIENTS_MAX_PAGE_SIZE}"}, 400
+            try:
+                after = decode_cursor(cursor) if cursor else None
+            except (ValueError, TypeError):
+                return {"error": "Invalid cursor"}, 400
+            
+            rows, next_key = self.db.get_bonus_claimable(
+                int(time.time()) - DAILY_BONUS_COOLDOWN, limit, after
+            )
+            return {
+                "user_ids": [row[0] for row in rows],
+                "next_cursor": encode_cursor(next_key) if next_key else None
+            }, 200
+        
+        except Exception as e:
+            logger.error(f"Error in get_bonus_claimable: {e}")
+            return {"error": "Internal server error"}, 500
+    
+    def get_user_ids(self, limit=RECIPIENTS_PAGE_SIZE, cursor=None):
+        """user_id всех пользователей постранично - получатели рассылок бота"""
+        try:
+            try:
+                limit = int(limit)
+                after = int(cursor) if cursor else None
+            except (ValueError, TypeError):
+                return {"error": "Limit and cursor must be integers"}, 400
+            if not 1 <= limit <= RECIPIENTS_MAX_PAGE_SIZE:
+                return {"error": f"Limit must be from 1 to {RECIPIENTS_MAX_PAGE_SIZE}"}, 400
+            
+            user_ids, next_key = self.db.get_user_ids_page(limit, after)
+            return {
+                "user_ids": user_ids,
+                "next_cursor": str(next_key) if next_key is not None else None
+            }, 200
+        
+        except Exception as e:
+            logger.error(f"Error in get_user_ids: {e}")
+            return {"error": "Internal server error"}, 500
+    
+    def spin_roulette(self, data, idempotency_key=None):
+        return self.idempotent(
+            'spin-roulette', idempotency_key, data,
+            lambda: self.single_flight('spin-roulette', 'spin', data, self.play_spin, idempotency_key)
+        )
+    
+    def play_spin(self, data):
+        try:
+            if not data:
+                return {"error": "No data provided"}, 400
+            
+            user_id = data.get('user_id')
+            if not user_id:
+                return {"error": "User ID is required"}, 400
+            
+            cost = SPIN_COST
+            
+            # Спин рулетки
+            item = roulette_table.draw()
+            
+            # Списание, выигрыш, статистика и транзакции - одним коммитом
+            status, new_balance = self.db.spin_roulette(user_id, cost, item)
+            if status == 'not_found':
+                return {"error": "User not found"}, 404
+            if status == 'insufficient':
+                return {"error": "Insufficient balance"}, 400
+            if status != 'ok':
+                return {"error": "Failed to process spin"}, 500
+            
+            logger.info(f"Roulette spin: User {user_id} - Won {item['name']} ({item['value']} stars)")
+            
+            return {
+                "won_item": item,
+                "new_balance": new_balance,
+                "cost": cost,
+                "message": f"🎉 Поздравляем! Вы выиграли {item['name']} ({item['value']}⭐)"
+            }, 200
+        
+        except Exception as e:
+            logger.error(f"Error in spin_roulette: {e}")
+            return {"error": "Internal server error"}, 500
+    
+    def spin_roulette_batch(self, data, idempotency_key=None):
+        return self.idempotent(
+            'spin-roulette/batch', idempotency_key, data,
+            lambda: self.single_flight('spin-roulette/batch', 'spin', data, self.play_spin_batch, idempotency_key)
+        )
+    
+    def play_spin_batch(self, data):
+        try:
+            if not data:
+                return {"error": "No data provided"}, 400
+            
+            user_id = data.get('user_id')
+            if not user_id:
+                return {"error": "User ID is required"}, 400
+            
+            count = data.get('count')
+            if not isinstance(count, int) or isinstance(count, bool) or not 1 <= count <= MAX_BATCH_SPINS:
+                return {"error": f"Count must be an integer from 1 to {MAX_BATCH_SPINS}"}, 400
+            
+            cost = SPIN_COST
+            
+            # Все спины разыгрываются сразу и записываются одной транзакцией
+            items = roulette_table.draw_many(count)
+            
+            status, new_balance = self.db.spin_roulette_batch(user_id, cost, items)
+            if status == 'not_found':
+                return {"error": "User not found"}, 404
+            if status == 'insufficient':
+                return {"error": "Insufficient balance"}, 400
+            if status != 'ok':
+                return {"error": "Failed to process spin"}, 500
+            
+            # Сводка по выигранным предметам
+            summary = {}
+            for item in items:
+                summary[item['name']] = summary.get(item['name'], 0) + 1
+            total_won = sum(item['value'] for item in items)
+            
+            logger.info(f"Roulette batch spin: User {user_id} - {count} spins, won {total_won} stars")
+            
+            return {
+                "won_items": items,
+                "summary": summary,
+                "count": count,
+                "total_won": total_won,
+                "new_balance": new_balance,
+                "cost": cost * count,
+                "message": f"🎉 {count} спинов: выигрыш {total_won}⭐"
+            }, 200
+        
+        except Exception as e:
+            logger.error(f"Error in spin_roulette_batch: {e}")
+            return {"error": "Internal server error"}, 500
+    
+    def get_inventory(self, user_id, view='items', limit=INVENTORY_PAGE_SIZE, cursor=None):
+        """Стопки предметов постранично (limit, cursor) или сводкой по предметам (view=summary).
+        
+        При успехе тело - (JSON в байтах, ETag, курсор следующей страницы).
+        Ответ кэшируется до следующего изменения инвентаря пользователя.
+        """
+        try:
+            try:
+                limit = int(limit)
+            except (ValueError, TypeError):
+                return {"error": "Limit must be an integer"}, 400
+            
+            if view not in ('items', 'summary'):
+                return {"error": "Unknown view"}, 400
+            if not 1 <= limit <= INVENTORY_MAX_PAGE_SIZE:
+                return {"error": f"Limit must be from 1 to {INVENTORY_MAX_PAGE_SIZE}"}, 400
+            
+            key = (view, limit, cursor)
+            cached = self.db.inventory_cache.get(user_id, key)
+            if cached is not None:
+                return cached, 200
+            
+            token = self.db.inventory_cache.token(user_id)
+            next_cursor = None
+            
+            if view == 'summary':
+                result = [
+                    {"item_name": row[0], "item_value": row[1], "count": row[2]}
+                    for row in self.db.get_inventory_summary(user_id)
+                ]
+            else:
+                try:
+                    after = decode_cursor(cursor) if cursor else None
+                except (ValueError, TypeError):
+                    return {"error": "Invalid cursor"}, 400
+                
+                inventory, next_key = self.db.get_inventory_page(user_id, limit, after)
+                if next_key:
+                    next_cursor = encode_cursor(next_key)
+                
+                # Форматируем результат
+                result = []
+                for item in inventory:
+                    result.append({
+                        "id": item[0],
+                        "user_id": item[1],
+                        "item_name": item[2],
+                        "item_value": item[3],
+                        "quantity": item[4],
+                        "created_at": item[5],
+                        "updated_at": item[6]
+                    })
+            
+            body = dump_json(result)
+            etag = hashlib.sha1(body).hexdigest()
+            cached = (body, etag, next_cursor)
+            self.db.inventory_cache.put(user_id, token, key, cached)
+            return cached, 200
+        
+        except Exception as e:
+            logger.error(f"Error in get_inventory: {e}")
+            return {"error": "Internal server error"}, 500
+    
+    def withdraw_item(self, data, idempotency_key=None):
+        return self.idempotent('withdraw', idempotency_key, data, lambda: self.request_withdrawal(data))
+    
+    def request_withdrawal(self, data):
+        try:
+            if not data:
+                return {"error": "No data provided"}, 400
+            
+            user_id = data.get('user_id')
+            inventory_id = data.get('inventory_id')
+            item_name = data.get('item_name')
+            username = data.get('username', 'Unknown')
+            
+            # Предмет задаётся id стопки из /api/inventory (или названием);
+            # item_value от клиента не используется - ценность берётся из инвентаря
+            if not user_id or not (inventory_id or item_name):
+                return {"error": "Missing required fields"}, 400
+            if inventory_id is not None and (not isinstance(inventory_id, int) or isinstance(inventory_id, bool)):
+                return {"error": "inventory_id must be an integer"}, 400
+            
+            # Списание предмета, заявка и журнал - одним коммитом
+            status, withdrawal = self.db.create_withdrawal(user_id, username, inventory_id, item_name)
+            if status == 'not_found':
+                return {"error": "User not found"}, 404
+            if status == 'no_item':
+                return {"error": "Item not found in inventory"}, 400
+            if status != 'ok':
+                return {"error": "Failed to create withdrawal"}, 500
+            
+            withdrawal_id, item_name, item_value = withdrawal
+            logger.info(f"Withdrawal created: User {user_id} (@{username}) - {item_name} ({item_value} stars)")
+            
+            return {
+                "status": "withdrawal_created",
+                "id": withdrawal_id,
+                "item_name": item_name,
+                "item_value": item_value,
+                "message": "Заявка на вывод создана! Администратор свяжется с вами."
+            }, 200
+        
+        except Exception as e:
+            logger.error(f"Error in withdraw_item: {e}")
+            return {"error": "Internal server error"}, 500
+    
+    def get_withdrawals(self, status='pending', user_id=None, since=None, until=None,
+                        limit=WITHDRAWALS_PAGE_SIZE, cursor=None):
+        """Очередь заявок на вывод постранично; status='all' - без фильтра по статусу"""
+        try:
+            if status != 'all' and status not in WITHDRAWAL_STATUSES:
+                return {"error": f"Status must be 'all' or one of: {', '.join(WITHDRAWAL_STATUSES)}"}, 400
+            try:
+                limit = int(limit)
+                user_id = int(user_id) if user_id else None
+            except (ValueError, TypeError):
+                return {"error": "Limit and user_id must be integers"}, 400
+            if not 1 <= limit <= WITHDRAWALS_MAX_PAGE_SIZE:
+                return {"error": f"Limit must be from 1 to {WITHDRAWALS_MAX_PAGE_SIZE}"}, 400
+            try:
+                after = decode_cursor(cursor) if cursor else None
+            except (ValueError, TypeError):
+                return {"error": "Invalid cursor"}, 400
+            
+            withdrawals, next_key = self.db.get_withdrawals_page(
+                limit,
+                status=None if status == 'all' else status,
+                user_id=user_id,
+                since=since,
+                until=until,
+                after=after
+            )
+            
+            # Форматируем результат
+            formatted_withdrawals = []
+            for w in withdrawals:
+                formatted_withdrawals.append({
+                    "id": w[0],
+                    "user_id": w[1],
+                    "username": w[2],
+                    "item_name": w[3],
+                    "item_value": w[4],
+                    "status": w[5],
+                    "created_at": w[6]
+                })
+            
+            return {
+                "withdrawals": formatted_withdrawals,
+                "next_cursor": encode_cursor(next_key) if next_key else None
+            }, 200
+        
+        except Exception as e:
+            logger.error(f"Error in get_withdrawals: {e}")
+            return {"error": "Internal server error"}, 500
+    
+    def update_withdrawals(self, data):
+        """Пакетное действие над заявками: {"ids": [...], "action": "approve" | "complete"}"""
+        try:
+            if not data:
+                return {"error": "No data provided"}, 400
+            
+            ids = data.get('ids')
+            action = data.get('action')
+            
+            if action not in WITHDRAWAL_ACTIONS:
+                return {"error": f"Action must be one of: {', '.join(WITHDRAWAL_ACTIONS)}"}, 400
+            if (not isinstance(ids, list) or not 1 <= len(ids) <= MAX_WITHDRAWAL_BATCH
+                    or not all(isinstance(i, int) and not isinstance(i, bool) for i in ids)):
+                return {"error": f"ids must be a list of 1 to {MAX_WITHDRAWAL_BATCH} integers"}, 400
+            
+            from_statuses, status = WITHDRAWAL_ACTIONS[action]
+            updated = self.db.set_withdrawals_status(ids, status, from_statuses)
+            if updated is None:
+                return {"error": "Failed to update withdrawals"}, 500
+            
+            logger.info(f"Withdrawals {action}: {updated}")
+            
+            return {
+                "status": "success",
+                "updated": updated,
+                "skipped": [i for i in ids if i not in set(updated)]
+            }, 200
+        
+        except Exception as e:
+            logger.error(f"Error in update_withdrawals: {e}")
+            return {"error": "Internal server error"}, 500
+    
+    def add_stars(self, data, idempotency_key=None):
+        return self.idempotent('admin/add-stars', idempotency_key, data, lambda: self.credit_stars(data))
+    
+    def credit_stars(self, data):
+        try:
+            if not data:
+                return {"error": "No data provided"}, 400
+            
+            user_id = data.get('user_id')
+            amount = data.get('amount')
+            
+            if not all([user_id, amount]):
+                return {"error": "User ID and amount are required"}, 400
+            
+            # Проверяем существование пользователя
+            user = self.db.get_user(user_id)
+            if not user:
+                return {"error": "User not found"}, 404
+            
+            # Обновляем баланс
+            success = self.db.update_balance(user_id, amount)
+            if not success:
+                return {"error": "Failed to update balance"}, 500
+            
+            # Добавляем транзакцию
+            self.db.add_transaction(user_id, "admin_add", amount, "Пополнение администратором")
+            
+            new_balance = self.db.get_user(user_id)['balance']
+            
+            logger.info(f"Stars added by admin: User {user_id} - {amount} stars")
+            
+            return {
+                "status": "success",
+                "new_balance": new_balance,
+                "message": f"Added {amount} stars to user {user_id}"
+            }, 200
+        
+        except Exception as e:
+            logger.error(f"Error in add_stars: {e}")
+            return {"error": "Internal server error"}, 500
+    
+    def get_admin_stats(self):
+        """Сводка для админ-панели из счётчиков, без сканирования таблиц"""
+        try:
+            today = datetime.now(timezone.utc).date()
+            yesterday = today - timedelta(days=1)
+            counters = self.db.get_counters((today.isoformat(), yesterday.isoformat()))
+            
+            def counter(name):
+                return counters.get(name, 0)
+            
+            withdrawals_by_status = {
+                name.split(':', 1)[1]: value
+                for name, value in counters.items()
+                if name.startswith('withdrawals:')
+            }
+            
+            return {
+                "total_users": counter('users'),
+                "total_withdrawals": counter('withdrawals'),
+                "withdrawals_by_status": withdrawals_by_status,
+                "total_spins": counter('tx_count:roulette_spin'),
+                "stars_wagered": -counter('tx_amount:roulette_spin'),
+                "stars_won": counter('tx_amount:item_won'),
+                "daily_bonus_stars": counter('tx_amount:daily_bonus'),
+                "admin_added_stars": counter('tx_amount:admin_add'),
+                "dau": counter(f"dau:{today.isoformat()}"),
+                "dau_yesterday": counter(f"dau:{yesterday.isoformat()}"),
+                "user_cache": self.db.user_cache.stats(),
+                "server_time": datetime.now().isoformat()
+            }, 200
+        
+        except Exception as e:
+            logger.error(f"Error in get_admin_stats: {e}")
+            return {"error": "Internal server error"}, 500
+    
+    def get_rollups(self, bucket='day', since=None, until=None, type=None):
+        """Агрегаты журнала по часам или дням (UTC); перед ответом дообрабатываются новые записи.
+        
+        since/until - границы периода в формате 'YYYY-MM-DD' или 'YYYY-MM-DD HH:00:00'.
+        """
+        try:
+            if bucket not in ROLLUP_BUCKETS:
+                return {"error": f"Bucket must be one of: {', '.join(ROLLUP_BUCKETS)}"}, 400
+            
+            # Если журнал пишется пачками, сначала дописываем очередь
+            if self.db.ledger is not None:
+                self.db.ledger.flush()
+            processed = self.db.rollups.refresh()
+            
+            rows = self.db.rollups.get(bucket, since or default_since(bucket), until, type)
+            
+            return {
+                "bucket": bucket,
+                "processed_through": processed,
+                "rollups": [
+                    {"period": row[0], "type": row[1], "count": row[2], "amount": row[3]}
+                    for row in rows
+                ]
+            }, 200
+        
+        except Exception as e:
+            logger.error(f"Error in get_rollups: {e}")
+            return {"error": "Internal server error"}, 500
+    
+    def export(self, table, fmt='csv', compress=None, since=None, until=None,
+               type_=None, status=None, user_id=None):
+        """Потоковая выгрузка таблицы (export.py).
+        
+        При успехе тело - (генератор байтов, Content-Type, имя файла).
+        """
+        try:
+            if table not in EXPORT_TABLES:
+                return {"error": f"Table must be one of: {', '.join(EXPORT_TABLES)}"}, 404
+            if fmt not in EXPORT_FORMATS:
+                return {"error": f"Format must be one of: {', '.join(EXPORT_FORMATS)}"}, 400
+            
+            filters = {}
+            for column, value in (('type', type_), ('status', status), ('user_id', user_id)):
+                if not value:
+                    continue
+                if column not in EXPORT_TABLES[table]['filters']:
+                    return {"error": f"Filter '{column}' is not supported for {table}"}, 400
+                filters[column] = value
+            if 'user_id' in filters:
+                try:
+                    filters['user_id'] = int(filters['user_id'])
+                except ValueError:
+                    return {"error": "user_id must be an integer"}, 400
+            
+            compress = compress in ('1', 'true', True)
+            filename = f"{table}.{fmt}.gz" if compress else f"{table}.{fmt}"
+            content_type = 'application/gzip' if compress else EXPORT_FORMATS[fmt]
+            archives = []
+            if table == 'transactions':
+                archives = [path for month, path in self.db.archive.months(since, until)]
+            chunks = stream_export(self.db.pool, table, fmt, compress, since, until, filters, archives)
+            
+            logger.info(f"Export started: {table} ({fmt}{', gzip' if compress else ''}) {filters}")
+            return (chunks, content_type, filename), 200
+        
+        except Exception as e:
+            logger.error(f"Error in export: {e}")
+            return {"error": "Internal server error"}, 500
+    
+    def get_archives(self):
+        """Архивы журнала по месяцам (archive.py)"""
+        try:
+            archives = self.db.get_ledger_archives()
+            return {
+                "archives": [
+                    {"month": row[0], "file": row[1], "rows": row[2], "archived_at": row[3]}
+                    for row in archives
+                ]
+            }, 200
+        except Exception as e:
+            logger.error(f"Error in get_archives: {e}")
+            return {"error": "Internal server error"}, 500
+    
+    def complete_withdrawal(self, withdrawal_id):
+        try:
+            success = self.db.update_withdrawal_status(withdrawal_id, "completed")
+            if success:
+                logger.info(f"Withdrawal {withdrawal_id} marked as completed")
+                return {"status": "success", "message": "Withdrawal completed"}, 200
+            else:
+                return {"error": "Failed to update withdrawal"}, 500
+        
+        except Exception as e:
+            logger.error(f"Error in complete_withdrawal: {e}")
+            return {"error": "Internal server error"}, 500
+    
+    def get_user_game_stats(self, user_id):
+        try:
+            stats = self.db.get_user_stats(user_id)
+            return stats, 200
+        except Exception as e:
+            logger.error(f"Error in get_user_game_stats: {e}")
+            return {"error": "Internal server error"}, 500
+    
+    def dispatch(self, endpoint, method='GET', data=None, idempotency_key=None):
+        """Вызов по пути API без HTTP: dispatch('user/123') == GET /api/user/123.
+        
+        Числа из пути передаются позиционными аргументами, параметры строки
+        запроса - именованными, тело POST - аргументом data,
+        заголовок Idempotency-Key - аргументом idempotency_key.
+        """
+        parts = urlsplit(endpoint)
+        path = parts.path.strip('/')
+        for route_method, pattern, name in ROUTES:
+            if route_method != method:
+                continue
+            match = pattern.fullmatch(path)
+            if match is None:
+                continue
+            handler = getattr(self, name)
+            # data и idempotency_key - только методам, которые их принимают
+            # (например, complete_withdrawal тела не читает, как и его HTTP-вид)
+            accepted = inspect.signature(handler).parameters
+            args = [int(g) for g in match.groups()]
+            kwargs = dict(parse_qsl(parts.query))
+            if method == 'POST' and 'data' in accepted:
+                kwargs['data'] = data
+            if idempotency_key and 'idempotency_key' in accepted:
+                kwargs['idempotency_key'] = idempotency_key
+            try:
+                return handler(*args, **kwargs)
+            except TypeError as e:
+                logger.error(f"Bad arguments for {method} {endpoint}: {e}")
+                return {"error": "Bad request"}, 400
+        return {"error": "Endpoint not found"}, 404
+
+# Маршруты для dispatch; совпадают с путями /api/... в app.py, кроме двух,
+# которые есть только по HTTP: потоковой выгрузки /api/admin/export и
+# /api/inventory/<id> (готовое тело в байтах, ETag/If-None-Match и курсор
+# в заголовке X-Next-Cursor)
+ROUTES = [
+    ('GET', re.compile(r'user/(\d+)'), 'get_user'),
+    ('GET', re.compile(r'profile/(\d+)'), 'get_profile'),
+    ('POST', re.compile(r'register'), 'register_user'),
+    ('POST', re.compile(r'daily-bonus'), 'daily_bonus'),
+    ('POST', re.compile(r'spin-roulette'), 'spin_roulette'),
+    ('POST', re.compile(r'spin-roulette/batch'), 'spin_roulette_batch'),
+    ('POST', re.compile(r'withdraw'), 'withdraw_item'),
+    ('GET', re.compile(r'admin/withdrawals'), 'get_withdrawals'),
+    ('POST', re.compile(r'admin/withdrawals/batch'), 'update_withdrawals'),
+    ('POST', re.compile(r'admin/add-stars'), 'add_stars'),
+    ('GET', re.compile(r'admin/stats'), 'get_admin_stats'),
+    ('GET', re.compile(r'admin/rollups'), 'get_rollups'),
+    ('GET', re.compile(r'admin/bonus-claimable'), 'get_bonus_claimable'),
+    ('GET', re.compile(r'admin/user-ids'), 'get_user_ids'),
+    ('GET', re.compile(r'admin/archives'), 'get_archives'),
+    ('POST', re.compile(r'admin/complete-withdrawal/(\d+)'), 'complete_withdrawal'),
+    ('GET', re.compile(r'user/stats/(\d+)'), 'get_user_game_stats'),
+]
+
+class AsyncCasinoService:
+    """Асинхронная обёртка CasinoService для ASGI и бота.
+    
+    Методы те же, что у CasinoService, но возвращают корутины; блокирующая
+    работа с SQLite выполняется в ограниченном пуле потоков, поэтому число
+    одновременных запросов не связано с числом потоков.
+    """
+    
+    def __init__(self, service, max_workers=ASYNC_DB_WORKERS):
+        self.service = service
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='casino-db')
+    
+    async def run(self, func, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, functools.partial(func, *args, **kwargs))
+    
+    def __getattr__(self, name):
+        method = getattr(self.service, name)
+        
+        async def call(*args, **kwargs):
+            return await self.run(method, *args, **kwargs)
+        return call
+    
+    def close(self):
+        self.executor.shutdown(wait=True)
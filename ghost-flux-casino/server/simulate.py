@@ -0,0 +1,189 @@
+"""Монте-Карло симуляция экономики рулетки и ежедневного бонуса.
+
+Читает те же таблицы, что и сервер (prizes.py), поэтому запускается
+перед изменением конфигурации:
+
+    python simulate.py --spins 10000000 --players 20000 --bankroll 100
+    python simulate.py --max-rtp 1.0   # код выхода 1, если RTP может превышать 100%
+
+Модель игрока повторяет экономику сервера: спин только списывает звёзды
+с баланса, а выигранный предмет попадает в инвентарь (его можно вывести,
+но не вернуть на баланс). Поэтому стартового баланса хватает ровно на
+bankroll // cost спинов; отчёт показывает, сколько стоят предметы,
+собранные к этому моменту. Ежедневный бонус и пополнения в модель не входят.
+"""
+import os
+import sys
+import json
+import math
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from prizes import SPIN_COST, roulette_table, daily_bonus_table
+
+# Сколько спинов один процесс держит в памяти за раз
+CHUNK_SPINS = 2_000_000
+
+# Перцентили стоимости инвентаря игрока к моменту, когда кончился баланс
+INVENTORY_PERCENTILES = [10, 50, 90, 99]
+
+Z_95 = 1.959963984540054
+
+def positive_int(value):
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"must be a positive integer, got {value}")
+    return number
+
+def non_negative_int(value):
+    number = int(value)
+    if number < 0:
+        raise argparse.ArgumentTypeError(f"must be a non-negative integer, got {value}")
+    return number
+
+def table_values(table, value_key):
+    return np.array([item[value_key] for item in table.items], dtype=np.int64)
+
+def theoretical(table, value_key):
+    weights = np.array([item[table.weight_key] for item in table.items], dtype=np.float64)
+    values = table_values(table, value_key).astype(np.float64)
+    p = weights / weights.sum()
+    mean = float((p * values).sum())
+    return mean, float((p * (values - mean) ** 2).sum())
+
+def run_chunk(args):
+    """Симулирует players игроков по horizon спинов; возвращает суммы для агрегации
+    и стоимость инвентаря каждого игрока после первых paid_spins спинов"""
+    sampler, values, players, horizon, paid_spins, seed = args
+    rng = np.random.default_rng(seed)
+    
+    idx = sampler.sample(players * horizon, rng).reshape(players, horizon)
+    won = values[idx]
+    
+    total = int(won.sum())
+    total_sq = int((won * won).sum())
+    
+    # Выигрыш уходит в инвентарь, а не на баланс: стартового баланса
+    # хватает ровно на paid_spins спинов, их предметы и остаются у игрока
+    inventory = won[:, :paid_spins].sum(axis=1)
+    
+    return total, total_sq, inventory
+
+def simulate(table, value_key, cost, spins, players, bankroll, workers, seed):
+    horizon = max(1, spins // players)
+    paid_spins = min(horizon, bankroll // cost) if cost else 0
+    sampler = table.compiled[1]
+    values = table_values(table, value_key)
+    
+    chunk_players = max(1, CHUNK_SPINS // horizon)
+    chunks = []
+    remaining = players
+    while remaining > 0:
+        chunks.append(min(chunk_players, remaining))
+        remaining -= chunks[-1]
+    seeds = np.random.SeedSequence(seed).spawn(len(chunks))
+    jobs = [
+        (sampler, values, size, horizon, paid_spins, s)
+        for size, s in zip(chunks, seeds)
+    ]
+    
+    started = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        results = list(executor.map(run_chunk, jobs))
+    elapsed = time.perf_counter() - started
+    
+    n = players * horizon
+    total = sum(r[0] for r in results)
+    total_sq = sum(r[1] for r in results)
+    mean = total / n
+    variance = max(total_sq / n - mean * mean, 0.0)
+    half_width = Z_95 * math.sqrt(variance / n)
+    inventory = np.concatenate([r[2] for r in results])
+    expected_mean, expected_variance = theoretical(table, value_key)
+    
+    report = {
+        "spins": n,
+        "players": players,
+        "spins_per_player": horizon,
+        "elapsed_sec": round(elapsed, 3),
+        "expected_value": mean,
+        "expected_value_ci95": [mean - half_width, mean + half_width],
+        "variance": variance,
+        "theoretical_value": expected_mean,
+        "theoretical_variance": expected_variance,
+    }
+    if cost:
+        report.update({
+            "cost": cost,
+            "bankroll": bankroll,
+            "rtp": mean / cost,
+            "rtp_ci95": [(mean - half_width) / cost, (mean + half_width) / cost],
+            "house_edge": 1 - mean / cost,
+            "theoretical_rtp": expected_mean / cost,
+            # Баланс кончается на спине bankroll // cost; если спинов на игрока
+            # меньше, стоимость инвентаря считается по всем его спинам
+            "spins_until_broke": bankroll // cost,
+            "inventory_spins": paid_spins,
+            "inventory_value_mean": float(inventory.mean()),
+            "inventory_value_percentiles": {
+                p: float(v) for p, v in zip(INVENTORY_PERCENTILES, np.percentile(inventory, INVENTORY_PERCENTILES))
+            },
+            "inventory_above_bankroll": float((inventory > bankroll).mean()),
+        })
+    return report
+
+def print_report(title, report):
+    print(f"=== {title} ===")
+    print(f"Спинов: {report['spins']:,} ({report['players']:,} игроков x {report['spins_per_player']:,}) "
+          f"за {report['elapsed_sec']} с")
+    low, high = report['expected_value_ci95']
+    print(f"Средний выигрыш: {report['expected_value']:.4f} (95% ДИ {low:.4f} - {high:.4f}), "
+          f"теория {report['theoretical_value']:.4f}")
+    print(f"Дисперсия: {report['variance']:.4f}, теория {report['theoretical_variance']:.4f}")
+    if 'rtp' in report:
+        low, high = report['rtp_ci95']
+        print(f"RTP: {report['rtp']:.4%} (95% ДИ {low:.4%} - {high:.4%}), теория {report['theoretical_rtp']:.4%}")
+        print(f"Преимущество казино: {report['house_edge']:.4%}")
+        print(f"Стартовый баланс {report['bankroll']} кончается на спине {report['spins_until_broke']} "
+              f"(выигрыши идут в инвентарь, а не на баланс)")
+        print(f"Стоимость инвентаря после {report['inventory_spins']} спинов: "
+              f"в среднем {report['inventory_value_mean']:.1f}")
+        for p, value in report['inventory_value_percentiles'].items():
+            print(f"  {p:>2}-й перцентиль: {value:.0f}")
+        print(f"Дороже стартового баланса: {report['inventory_above_bankroll']:.2%} игроков")
+    print()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="RTP и преимущество казино для таблиц призов")
+    parser.add_argument('--spins', type=positive_int, default=10_000_000, help="всего спинов рулетки")
+    parser.add_argument('--players', type=positive_int, default=10_000, help="число симулируемых игроков")
+    parser.add_argument('--bankroll', type=non_negative_int, default=100, help="стартовый баланс игрока")
+    parser.add_argument('--bonus-claims', type=positive_int, default=1_000_000, help="розыгрышей ежедневного бонуса")
+    parser.add_argument('--workers', type=positive_int, default=os.cpu_count(), help="число процессов")
+    parser.add_argument('--seed', type=int, default=None, help="seed для воспроизводимого прогона")
+    parser.add_argument('--max-rtp', type=float, default=None,
+                        help="завершиться с кодом 1, если верхняя граница ДИ для RTP выше порога")
+    parser.add_argument('--json', action='store_true', help="вывести отчёт в JSON")
+    args = parser.parse_args(argv)
+    
+    roulette = simulate(roulette_table, 'value', SPIN_COST, args.spins, args.players,
+                        args.bankroll, args.workers, args.seed)
+    bonus = simulate(daily_bonus_table, 'stars', 0, args.bonus_claims, min(1000, args.bonus_claims), 0,
+                     args.workers, args.seed)
+    
+    if args.json:
+        print(json.dumps({"roulette": roulette, "daily_bonus": bonus}, ensure_ascii=False, indent=2))
+    else:
+        print_report("Рулетка", roulette)
+        print_report("Ежедневный бонус", bonus)
+    
+    if args.max_rtp is not None and roulette['rtp_ci95'][1] > args.max_rtp:
+        print(f"RTP выше допустимого {args.max_rtp:.2%}", file=sys.stderr)
+        return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())